@@ -1,4 +1,6 @@
 from unittest import TestCase, main
+
+import Matcher
 from Types import Type
 
 types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
@@ -24,6 +26,9 @@ class Attack:
         self.off_table = matchups.off_table
         self.off_score = matchups.off_score
 
+        """The row of the effectiveness matrix, aligned with types[:gen_types[matchups.gen]]."""
+        self.off_vector = Matcher.effectiveness(matchups.gen)[Matcher.type_index[self.type], :gen_types[matchups.gen]]
+
     def __str__(self):
         return f"{self.name}: type = {self.type}, power = {self.power}, pp = {self.pp}"
 
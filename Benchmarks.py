@@ -0,0 +1,203 @@
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+from statistics import median
+from time import perf_counter
+from unittest import TestCase, main
+
+import numpy as np
+
+import Matcher
+import Pokemon as PokemonModule
+from Pokemon import Pokemon
+from Types import Type, typings
+
+types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
+         "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
+gen_types = {1: 15, 2: 17, 6: 18}
+
+"""
+Every scenario runs for every generation: setup(gen) prepares a state outside of the
+timing (clearing the caches the scenario would otherwise hit) and run(state) is timed.
+The iteration counts are pinned so that results stay comparable between runs; a run
+records the median and the minimum seconds per iteration and the peak memory allocated
+by one more iteration, measured separately with tracemalloc.
+"""
+
+
+def _unload(gen):
+    Matcher._effectiveness.pop(gen, None)
+    Matcher.def_matchups.loaded.pop(gen, None)
+    Matcher.off_matchups.loaded.pop(gen, None)
+
+def _clear_pokemon():
+    PokemonModule._def_matchups.cache_clear()
+    PokemonModule._off_matchups.cache_clear()
+
+def _sample(gen, step=8):
+    """Every step-th typing of the generation, the same ones on every run."""
+    return typings(gen)[::step]
+
+
+def setup_matcher_parse(gen):
+    return gen
+
+def run_matcher_parse(gen):
+    Matcher.parse_matchups("defensive", gen)
+    Matcher.parse_matchups("offensive", gen)
+
+def setup_matcher_load(gen):
+    _unload(gen)
+    return gen
+
+def run_matcher_load(gen):
+    Matcher.load_generation(gen)
+
+def setup_type_construction(gen):
+    Matcher.preload(gen)
+    return gen
+
+def run_type_construction(gen):
+    """The types are built in an empty registry which is dropped afterwards, so the flyweights
+    the rest of the process holds stay the only instances of their types."""
+    registry, Type._registry = Type._registry, {}
+    try:
+        for element in types[:gen_types[gen]]:
+            Type(element, gen)
+    finally:
+        Type._registry = registry
+
+def setup_def_matchups(gen):
+    _clear_pokemon()
+    return [Pokemon(None, typing, gen) for typing in typings(gen)]
+
+def run_def_matchups(monsters):
+    _clear_pokemon()
+    for monster in monsters:
+        monster._def_key = None
+        monster.get_def_matchups()
+
+def setup_off_matchups(gen):
+    return [Pokemon(None, typing, gen) for typing in typings(gen)]
+
+def run_off_matchups(monsters):
+    _clear_pokemon()
+    for monster in monsters:
+        monster.set_moves_by_type(monster.typing_str)
+
+def coverage_scenario(moves):
+    """Returns the (setup, run) of get_off_coverage(moves) for a sample of typings."""
+    def setup(gen):
+        return [Pokemon(None, typing, gen) for typing in _sample(gen, 8 if moves < 4 else 32)]
+
+    def run(monsters):
+        for monster in monsters:
+            monster.get_off_coverage(moves)
+    return setup, run
+
+
+"""{name: (setup, run, iterations)}"""
+scenarios = {"matcher_parse": (setup_matcher_parse, run_matcher_parse, 200),
+             "matcher_load": (setup_matcher_load, run_matcher_load, 200),
+             "type_construction": (setup_type_construction, run_type_construction, 200),
+             "def_matchups": (setup_def_matchups, run_def_matchups, 50),
+             "off_matchups": (setup_off_matchups, run_off_matchups, 50)}
+for moves, iterations in zip([1, 2, 3, 4], [50, 50, 20, 10]):
+    scenarios[f"off_coverage_{moves}"] = (*coverage_scenario(moves), iterations)
+
+
+def measure(setup, run, gen, iterations):
+    """Returns {"iterations", "median", "min", "peak_kB"} of a scenario for a generation."""
+    times = []
+    run(setup(gen))
+    for _ in range(iterations):
+        state = setup(gen)
+        start = perf_counter()
+        run(state)
+        times.append(perf_counter() - start)
+
+    state = setup(gen)
+    tracemalloc.start()
+    run(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"iterations": iterations, "median": median(times), "min": min(times), "peak_kB": peak / 1024}
+
+def run_benchmarks(names=None, generations=None, scale=1):
+    """Runs the scenarios 'names' (all by default) for the generations, returns the results as a JSON-able dict.
+
+    scale multiplies the pinned iteration counts (at least one iteration is run).
+    """
+    results = {}
+    for name in names or scenarios:
+        setup, run, iterations = scenarios[name]
+        for gen in generations or Matcher.generations:
+            results[f"{name}/gen{gen}"] = measure(setup, run, gen, max(1, int(iterations*scale)))
+    return {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+            "results": results}
+
+def compare(current, baseline, tolerance=0.25):
+    """Returns the regressions of current against baseline as [(key, metric, baseline, current)].
+
+    A scenario regresses if its median time or its peak memory exceeds the baseline by
+    more than 'tolerance'; scenarios missing from either side are ignored.
+    """
+    regressions = []
+    for key, result in current["results"].items():
+        if key not in baseline["results"]:
+            continue
+        for metric in ["median", "peak_kB"]:
+            before, after = baseline["results"][key][metric], result[metric]
+            if after > before * (1 + tolerance):
+                regressions.append((key, metric, before, after))
+    return regressions
+
+
+class BenchmarksTest(TestCase):
+    def test_compare(self):
+        baseline = {"results": {"a/gen1": {"median": 1.0, "peak_kB": 10}, "b/gen1": {"median": 1.0, "peak_kB": 10}}}
+        current = {"results": {"a/gen1": {"median": 1.2, "peak_kB": 14}, "b/gen1": {"median": 2.0, "peak_kB": 10},
+                               "c/gen1": {"median": 9.0, "peak_kB": 90}}}
+        expected = [("a/gen1", "peak_kB", 10, 14), ("b/gen1", "median", 1.0, 2.0)]
+        actual = compare(current, baseline)
+        self.assertEqual(actual, expected)
+
+    def test_type_construction_keeps_flyweights(self):
+        expected = Type("Fire", 2)
+        run_benchmarks(["type_construction"], generations=[2], scale=0)
+        actual = Type("Fire", 2)
+        self.assertIs(actual, expected)
+
+    def test_run_all_scenarios_gen1(self):
+        expected = sorted(f"{name}/gen1" for name in scenarios)
+        actual = sorted(run_benchmarks(generations=[1], scale=0)["results"])
+        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["test"]:
+        main(argv=sys.argv[:1] + sys.argv[2:])
+
+    parser = argparse.ArgumentParser(description="Runs the benchmark scenarios, 'test' runs the tests instead.")
+    parser.add_argument("--only", action="append", choices=list(scenarios), help="scenario to run, all by default")
+    parser.add_argument("--gen", action="append", type=int, choices=Matcher.generations)
+    parser.add_argument("--scale", type=float, default=1, help="multiplies the pinned iteration counts")
+    parser.add_argument("--out", help="writes the results to this JSON file")
+    parser.add_argument("--baseline", help="fails if the results regress against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.only, args.gen, args.scale)
+    for key, result in report["results"].items():
+        print(f"{key:28} {result['median']*1000:10.3f} ms  {result['peak_kB']:10.1f} kB")
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(report, file, indent=1)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for key, metric, before, after in regressions:
+            print(f"REGRESSION {key} {metric}: {before:.6g} -> {after:.6g}")
+        sys.exit(1 if regressions else 0)
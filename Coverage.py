@@ -0,0 +1,435 @@
+import json
+import sys
+from heapq import heappush, heappushpop
+from itertools import combinations, count
+from os import chmod, fdopen, listdir, makedirs, path, remove, replace
+from tempfile import TemporaryDirectory, mkstemp
+from unittest import TestCase, main
+
+import numpy as np
+
+import Matcher
+from Types import normalize_gen, typings, typing_row
+
+types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
+         "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
+gen_types = {1: 15, 2: 17, 6: 18}
+
+table_dir = path.join(path.dirname(path.abspath(__file__)), "coverage_table")
+table_sizes = [1, 2, 3, 4]
+
+
+def coverage_rows(typing, generation=6, STAB=True):
+    """Returns the (18 x types) array of the multipliers dealt by a move of every type.
+
+    Row k holds what a move of types[k] deals to the types of the generation when used by a
+    Pokemon of the given typing, i.e. the row of the effectiveness matrix times 1.5 for STAB.
+    """
+    gen = normalize_gen(generation)
+    rows = Matcher.effectiveness(gen)[:, :gen_types[gen]].copy()
+    if STAB:
+        for element in set(typing) - {None, "None"}:
+            rows[Matcher.type_index[element]] *= 1.5
+    return rows
+
+def coverage_base(rows, given):
+    """Returns the multipliers the given move types already deal to every target."""
+    base = np.zeros(rows.shape[1])
+    for element in given:
+        np.maximum(base, rows[Matcher.type_index[element]], out=base)
+    return base
+
+def number(value):
+    """Turning whole scores into ints, the way Pokemon reports its scores."""
+    value = float(value)
+    if value%1 == 0:
+        return int(value)
+    return value
+
+
+class Scorer:
+    """Scores combinations of rows the way get_off_matchups scores moves, without allocating:
+    the rows are split once and the multipliers of a combination are accumulated in a
+    preallocated buffer, which vector() returns and the next call overwrites."""
+    __slots__ = ("rows", "base", "buffer")
+
+    def __init__(self, rows, base):
+        self.rows = list(rows)
+        self.base = base
+        self.buffer = np.empty_like(base)
+
+    def vector(self, combination):
+        """Returns max(base, rows[i] for i in combination) for every target, in the buffer."""
+        buffer = self.buffer
+        np.copyto(buffer, self.base)
+        for i in combination:
+            np.maximum(buffer, self.rows[i], out=buffer)
+        return buffer
+
+    def score(self, combination):
+        return self.vector(combination).sum()
+
+
+class Ranking:
+    """Collects scored combinations: all ties of the best score and the top_k overall."""
+    def __init__(self, top_k=None):
+        self.top_k = top_k
+        self.score = -1
+        self.best = []
+        self.heap = []
+        self.order = count()
+
+    def threshold(self):
+        """Combinations scoring less than this can be discarded."""
+        if self.top_k:
+            return self.heap[0][0] if len(self.heap) == self.top_k else -1
+        return self.score
+
+    def record(self, score, combination):
+        if score > self.score:
+            self.score, self.best = score, [combination]
+        elif score == self.score:
+            self.best.append(combination)
+        if self.top_k:
+            entry = (score, -next(self.order), combination)
+            if len(self.heap) < self.top_k:
+                heappush(self.heap, entry)
+            elif entry > self.heap[0]:
+                heappushpop(self.heap, entry)
+
+    def result(self):
+        """Returns (best, score, ranking), the ranking sorted by decreasing score, first found first for ties."""
+        ranking = [(score, combination) for score, _, combination in sorted(self.heap, reverse=True)]
+        return self.best, self.score, ranking
+
+
+def objectives(vectors):
+    """Returns (score, -unsusceptibles, advantages) of multiplier vectors, all three to maximise.
+
+    unsusceptibles counts the targets taking 0 and advantages those taking 2 or more.
+    """
+    return vectors.sum(axis=-1), -(vectors == 0).sum(axis=-1), (vectors >= 2).sum(axis=-1)
+
+class Front:
+    """Collects the combinations on the Pareto front of their objectives.
+
+    Only the points no other point dominates are kept, with all their tied combinations,
+    so the memory is bounded by the number of non-dominated points rather than by the
+    number of combinations enumerated.
+    """
+    def __init__(self):
+        self.points = {}
+
+    def dominated(self, point):
+        """Whether a point of the front is at least as good as 'point' in every objective, and different."""
+        return any(other != point and all(a >= b for a, b in zip(other, point)) for other in self.points)
+
+    def record(self, point, combination):
+        if point in self.points:
+            self.points[point].append(combination)
+        elif not self.dominated(point):
+            for other in [other for other in self.points if all(a <= b for a, b in zip(other, point))]:
+                del self.points[other]
+            self.points[point] = [combination]
+
+    def result(self):
+        """Returns [(point, combination)] sorted by decreasing point, first found first for ties."""
+        return [(point, combination) for point in sorted(self.points, reverse=True) for combination in self.points[point]]
+
+
+def branch_and_bound(rows, base, size, top_k=None):
+    """Finds the combinations of 'size' rows maximising the sum of the per-target maxima.
+
+    A combination scores sum(max(base, rows[i] for i in combination)). Combinations are
+    enumerated in the order of itertools.combinations and a branch is cut as soon as the
+    best score it could still reach, taking the maximum of every remaining row for every
+    target, falls below the score to beat.
+    Returns (best, score, ranking) where best lists all combinations reaching the maximal
+    score in enumeration order, and ranking the top_k (score, combination) pairs sorted by
+    decreasing score (first found first for ties), or [] if top_k is None.
+    """
+    n = len(rows)
+    ranking = Ranking(top_k)
+    if size > n:
+        return [], 0, []
+    """suffix[i] is the maximum of rows[i:], for every target."""
+    suffix = np.maximum.accumulate(rows[::-1], axis=0)[::-1]
+
+    def search(start, chosen, current):
+        remaining = size - len(chosen)
+        stop = n - remaining + 1
+        if remaining == 1:
+            """The last row is chosen for all candidates at once."""
+            scores = np.maximum(current, rows[start:stop]).sum(axis=1)
+            for i in np.flatnonzero(scores >= ranking.threshold()):
+                ranking.record(float(scores[i]), chosen + (start + int(i),))
+            return
+        for i in range(start, stop):
+            if np.maximum(current, suffix[i]).sum() < ranking.threshold():
+                break
+            search(i + 1, chosen + (i,), np.maximum(current, rows[i]))
+
+    search(0, (), base)
+    return ranking.result()
+
+
+def tier_masks(rows, base):
+    """Encodes the rows and the base as bitmasks over the targets, one field per multiplier tier.
+
+    Returns (scale, masks, base_mask). For every multiplier occurring, from the largest down,
+    a field holds the bit of every target hit with at least that multiplier; the field is
+    repeated (difference to the next smaller multiplier) * scale times. Combining moves is
+    then a bitwise OR and popcount(mask) / scale is the score of the combination.
+    """
+    levels = sorted((set(np.unique(rows).tolist()) | set(np.unique(base).tolist())) - {0}, reverse=True)
+    steps = [high - low for high, low in zip(levels, levels[1:] + [0])]
+    scale = 1
+    while any((step*scale)%1 for step in steps):
+        scale *= 2
+        if scale > 1024:
+            raise NotImplementedError("Multipliers not supported by the bitset engine, use branch_and_bound.")
+    fields = np.array([level for level, step in zip(levels, steps) for _ in range(int(step*scale))])
+
+    def encode(matrix):
+        """Bit k*targets + t of a row's mask is set if it hits target t with at least fields[k]."""
+        hits = (matrix[:, None, :] >= fields[None, :, None]).reshape(len(matrix), -1)
+        return [int.from_bytes(np.packbits(row, bitorder="little").tobytes(), "little") for row in hits]
+
+    return scale, encode(rows), encode(base[None, :])[0]
+
+def bitset_search(rows, base, size, top_k=None):
+    """Same as branch_and_bound, but scoring every combination with a bitwise OR and a popcount."""
+    n = len(rows)
+    ranking = Ranking(top_k)
+    if size > n:
+        return [], 0, []
+    scale, masks, base_mask = tier_masks(rows, base)
+
+    def search(start, chosen, current):
+        if len(chosen) == size - 1:
+            for i in range(start, n):
+                ranking.record((current | masks[i]).bit_count() / scale, chosen + (i,))
+            return
+        for i in range(start, n - (size - len(chosen)) + 1):
+            search(i + 1, chosen + (i,), current | masks[i])
+
+    search(0, (), base_mask)
+    return ranking.result()
+
+def pareto_search(rows, base, size):
+    """Finds the combinations of 'size' rows on the Pareto front of their objectives.
+
+    Enumerates like branch_and_bound, cutting a branch as soon as the optimistic objectives
+    of its maximum over the remaining rows are dominated by a point of the front: no
+    combination of the branch can do better in any objective.
+    Returns the Front.result() of ((score, -unsusceptibles, advantages), combination).
+    """
+    n = len(rows)
+    front = Front()
+    if size > n:
+        return []
+    suffix = np.maximum.accumulate(rows[::-1], axis=0)[::-1]
+
+    def search(start, chosen, current):
+        remaining = size - len(chosen)
+        stop = n - remaining + 1
+        if remaining == 1:
+            scores, unsusceptibles, advantages = objectives(np.maximum(current, rows[start:stop]))
+            for i, point in enumerate(zip(scores.tolist(), unsusceptibles.tolist(), advantages.tolist())):
+                front.record(point, chosen + (start + i,))
+            return
+        for i in range(start, stop):
+            if front.dominated(tuple(value.item() for value in objectives(np.maximum(current, suffix[i])))):
+                break
+            search(i + 1, chosen + (i,), np.maximum(current, rows[i]))
+
+    search(0, (), base)
+    return front.result()
+
+
+"""The search engines get_off_coverage can use besides "exhaustive"."""
+engines = {"bound": branch_and_bound, "bitset": bitset_search}
+
+
+def _write_atomically(target, write, mode="wb"):
+    """Calls write(file) on a temporary file in the directory of 'target', which then replaces it."""
+    handle, temporary = mkstemp(suffix=path.splitext(target)[1], dir=path.dirname(path.abspath(target)))
+    try:
+        with fdopen(handle, mode) as file:
+            write(file)
+        chmod(temporary, 0o644)
+        replace(temporary, target)
+    finally:
+        if path.exists(temporary):
+            remove(temporary)
+
+
+def precompute_table(directory=None, generations=None, engine="bound"):
+    """Writes the best additions of every typing for 1 to 4 moves, without given moves, to 'directory'.
+
+    For every generation, with and without STAB, three .npy files are written which can be
+    memory-mapped: "scores" (typings x sizes), "offsets" (typings * sizes + 1) into "combos",
+    and "combos", the tied best combinations as bitmasks of type indices. Rows follow
+    typings(gen). index.json lists them together with the hash of the type matchups.
+    Every file is written to a temporary file which then replaces it, index.json last, so
+    readers mapping the previous table keep a consistent view and an interrupted build
+    leaves the previous index in place.
+    """
+    directory = directory or table_dir
+    makedirs(directory, exist_ok=True)
+    index = {"source_hash": Matcher.source_hash(), "sizes": table_sizes, "tables": []}
+
+    for gen in generations or Matcher.generations:
+        n = gen_types[gen]
+        for STAB in [True, False]:
+            scores, offsets, combos = [], [0], []
+            for typing in typings(gen):
+                rows = coverage_rows(typing, gen, STAB)[:n]
+                for size in table_sizes:
+                    best, score, _ = engines[engine](rows, np.zeros(n), size)
+                    scores.append(score)
+                    combos.extend(sum(1 << k for k in combination) for combination in best)
+                    offsets.append(len(combos))
+
+            name = f"gen{gen}_{'stab' if STAB else 'nostab'}"
+            arrays = {"scores": np.array(scores).reshape(-1, len(table_sizes)),
+                      "offsets": np.array(offsets, dtype=np.int64), "combos": np.array(combos, dtype=np.uint32)}
+            for array, values in arrays.items():
+                _write_atomically(path.join(directory, f"{name}_{array}.npy"), lambda file: np.save(file, values))
+            index["tables"].append({"gen": gen, "STAB": STAB, "name": name})
+
+    _write_atomically(path.join(directory, "index.json"), lambda file: json.dump(index, file, indent=1), "w")
+    _tables.pop(directory, None)
+
+
+class CoverageTable:
+    """Read-only view on the memory-mapped files written by precompute_table."""
+    def __init__(self, directory=None):
+        directory = directory or table_dir
+        with open(path.join(directory, "index.json")) as file:
+            index = json.load(file)
+        self.source_hash = index["source_hash"]
+        self.sizes = index["sizes"]
+        self.tables = {}
+        for entry in index["tables"]:
+            self.tables[entry["gen"], entry["STAB"]] = tuple(
+                np.load(path.join(directory, f"{entry['name']}_{array}.npy"), mmap_mode="r")
+                for array in ["scores", "offsets", "combos"])
+
+    def get(self, typing, generation=6, STAB=True, size=1):
+        """Returns (best combinations of type indices, score), or None if the table does not cover it."""
+        key = (normalize_gen(generation), bool(STAB))
+        if key not in self.tables or size not in self.sizes:
+            return None
+        try:
+            row = typing_row(typing, key[0])
+        except NotImplementedError:
+            return None
+
+        scores, offsets, combos = self.tables[key]
+        cell = row*len(self.sizes) + self.sizes.index(size)
+        best = [tuple(k for k in range(len(types)) if mask >> k & 1)
+                for mask in combos[offsets[cell]:offsets[cell + 1]].tolist()]
+        return best, float(scores[row, self.sizes.index(size)])
+
+_tables = {}
+
+def load_table(directory=None):
+    """Returns the CoverageTable in 'directory', or None if it is missing or computed from other matchups.
+
+    Tables are loaded once per directory; a missing table is not remembered, so one
+    precompute_table writes later in the process is found.
+    """
+    directory = directory or table_dir
+    if directory in _tables:
+        return _tables[directory]
+    try:
+        table = CoverageTable(directory)
+    except (OSError, ValueError, KeyError):
+        return None
+    if table.source_hash != Matcher.source_hash():
+        return None
+    _tables[directory] = table
+    return table
+
+
+class CoverageTest(TestCase):
+    def brute_force(self, rows, base, size):
+        scores = {c: np.maximum(base, rows[list(c)].max(axis=0)).sum() for c in combinations(range(len(rows)), size)}
+        best = max(scores.values())
+        return [c for c in scores if scores[c] == best], best, scores
+
+    def test_branch_and_bound_Dragon_gen6(self):
+        rows = coverage_rows(["Dragon"], 6)[:18]
+        for size in [1, 2, 3]:
+            best, score, _ = self.brute_force(rows, np.zeros(18), size)
+            expected = (best, score)
+            actual = branch_and_bound(rows, np.zeros(18), size)[:2]
+            self.assertEqual(actual, expected)
+
+    def test_bitset_search_Fire_Flying_gen2(self):
+        rows = coverage_rows(["Fire", "Flying"], 2)[:17]
+        base = coverage_base(rows, ["Fire"])
+        for size in [1, 2, 3]:
+            expected = branch_and_bound(rows, base, size, top_k=4)
+            actual = bitset_search(rows, base, size, top_k=4)
+            self.assertEqual(actual, expected)
+
+    def test_table_gen1(self):
+        with TemporaryDirectory() as directory:
+            precompute_table(directory, generations=[1])
+            table = CoverageTable(directory)
+            rows = coverage_rows(["Ghost", "Poison"], 1)[:15]
+            expected = branch_and_bound(rows, np.zeros(15), 3)[:2]
+            actual = table.get(["Poison", "Ghost"], 1, STAB=True, size=3)
+            self.assertEqual(actual, expected)
+            self.assertIsNone(table.get(["Poison"], 6))
+            del table
+
+    def test_pareto_search_Ice_gen6(self):
+        rows = coverage_rows(["Ice"], 6)[:18]
+        base = coverage_base(rows, ["Ice"])
+        for size in [1, 2, 3]:
+            front = Front()
+            for c in combinations(range(18), size):
+                vector = np.maximum(base, rows[list(c)].max(axis=0))
+                front.record(tuple(value.item() for value in objectives(vector)), c)
+            expected = front.result()
+            actual = pareto_search(rows, base, size)
+            self.assertEqual(actual, expected)
+
+    def test_load_table_after_precompute(self):
+        with TemporaryDirectory() as directory:
+            self.assertIsNone(load_table(directory))
+            precompute_table(directory, generations=[1])
+            table = load_table(directory)
+            self.assertIsNotNone(table)
+            self.assertIs(load_table(directory), table)
+            del _tables[directory], table
+
+    def test_rebuild_keeps_mapped_table(self):
+        with TemporaryDirectory() as directory:
+            precompute_table(directory, generations=[1])
+            table = CoverageTable(directory)
+            expected = table.get(["Fire"], 1, size=2)
+            precompute_table(directory, generations=[1])
+            self.assertEqual(table.get(["Fire"], 1, size=2), expected)
+            self.assertEqual(CoverageTable(directory).get(["Fire"], 1, size=2), expected)
+            self.assertEqual(sorted(file for file in listdir(directory) if not file.startswith("gen1_")), ["index.json"])
+            del table
+
+    def test_branch_and_bound_top_5_gen1(self):
+        rows = coverage_rows(["Ghost"], 1, STAB=False)[:15]
+        base = coverage_base(rows, ["Normal"])
+        _, _, scores = self.brute_force(rows, base, 2)
+        expected = sorted(scores.values(), reverse=True)[:5]
+        actual = [score for score, _ in branch_and_bound(rows, base, 2, top_k=5)[2]]
+        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    if "--precompute" in sys.argv[1:]:
+        precompute_table()
+        print(f"Precomputed the coverage table in {table_dir}.")
+    else:
+        main()
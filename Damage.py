@@ -0,0 +1,153 @@
+from unittest import TestCase, main
+
+import numpy as np
+
+import Matcher
+import Moves
+import Species
+from Types import normalize_gen
+
+types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
+         "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
+gen_types = {1: 15, 2: 17, 6: 18}
+
+"""Before generation 4 the category of a damaging move is given by its type."""
+physical_types = ["Normal", "Fighting", "Flying", "Poison", "Ground", "Rock", "Bug", "Ghost", "Steel"]
+"""The 16 random factors (in percent) every damage is multiplied with."""
+rolls = np.arange(85, 101)
+
+"""
+The damage formula is the one of generation 3 onwards, for a level L attacker using a
+move of power P with its attacking stat A on a defending stat D:
+    floor(floor(floor(2L/5 + 2) * P * A / D) / 50) + 2
+which is then multiplied by the random roll, 1.5 for STAB and the type multiplier, flooring
+after every step. Stats are computed from base stats with a neutral nature.
+"""
+
+
+def calc_stats(base, level=50, iv=31, ev=0):
+    """Returns the stats (..., 6) of base stats (..., 6) in the order of Species.stat_columns."""
+    base = np.asarray(base, dtype=np.int64)
+    stats = (2*base + iv + ev//4) * level // 100 + 5
+    stats[..., 0] += level + 5
+    return stats
+
+def damage_rolls(power, attack, defense, stab, multiplier, level=50):
+    """Returns the damage of every random roll, an int array of shape (..., 16).
+
+    All arguments broadcast against each other; stab is a boolean array and multiplier the
+    type multiplier. Moves with power 0 deal no damage.
+    """
+    power, attack, defense = (np.asarray(x, dtype=np.int64)[..., None] for x in (power, attack, defense))
+    base = (2*level//5 + 2) * power * attack // defense // 50 + 2
+    damage = base * rolls // 100
+    damage = np.where(np.asarray(stab)[..., None], damage * 3 // 2, damage)
+    damage = np.floor(damage * np.asarray(multiplier, dtype=float)[..., None]).astype(np.int64)
+    return np.where(power > 0, damage, 0)
+
+def batch_damage(attacker_stats, attacker_types, move_rows, defender_stats, defender_types,
+                 generation=6, level=50, store=None):
+    """Evaluates every move of every attacker against every defender at once.
+
+    attacker_stats (A x 6) and defender_stats (D x 6) are stats as from calc_stats,
+    attacker_types (A x 2) and defender_types (D x 2) type indices (-1 for no type) and
+    move_rows (A x M) rows of the Moves store (Moves.default_store() by default), -1 for an
+    empty move slot. Returns a dict of (A x M x D) arrays: "min" and "max" damage and "ko",
+    the probability that the move knocks the defender out from full HP when it hits.
+    """
+    store = store or Moves.default_store()
+    gen = normalize_gen(generation)
+    attacker_stats, defender_stats = np.asarray(attacker_stats), np.asarray(defender_stats)
+    attacker_types, defender_types = np.asarray(attacker_types), np.asarray(defender_types)
+    move_rows = np.asarray(move_rows)
+
+    slot = move_rows >= 0
+    rows = np.where(slot, move_rows, 0)
+    move_types = store["type"][rows].astype(np.intp)
+    power = np.where(slot, store["power"][rows], 0)
+    if generation >= 4:
+        special = store["category"][rows] == Moves.categories.index("Special")
+    else:
+        special = ~np.isin(move_types, [Matcher.type_index[element] for element in physical_types])
+
+    """The attacking and defending stats: Attack and Defense, or Sp. Atk and Sp. Def."""
+    attack = np.where(special, attacker_stats[:, None, 3], attacker_stats[:, None, 1])
+    defense = np.where(special[..., None], defender_stats[None, None, :, 4], defender_stats[None, None, :, 2])
+    stab = (move_types[..., None] == attacker_types[:, None, :]).any(axis=-1)
+
+    """Column 18 of the extended matrix is the neutral column of a missing second type."""
+    matrix = np.hstack([Matcher.effectiveness(gen), np.ones((len(types), 1))])
+    defending = np.where(defender_types >= 0, defender_types, len(types))
+    multiplier = matrix[move_types[..., None], defending[None, None, :, 0]] \
+        * matrix[move_types[..., None], defending[None, None, :, 1]]
+
+    damage = damage_rolls(power[..., None], attack[..., None], defense, stab[..., None], multiplier, level)
+    hp = defender_stats[None, None, :, 0, None]
+    return {"min": damage[..., 0], "max": damage[..., -1], "ko": (damage >= hp).mean(axis=-1)}
+
+
+def team_damage_matrix(attackers, movesets, defenders, generation=6, level=50, species=None, moves=None):
+    """Returns the damage matrix of the species 'attackers' using 'movesets' against the species 'defenders'.
+
+    movesets lists the move names of every attacker. The result holds (attackers x defenders)
+    arrays: "move", the name of the move dealing the most damage, its "min" and "max"
+    damage as a fraction of the defender's HP and "ko", the best one hit KO probability of
+    any move. A 6x6 team matrix is a single batch_damage call.
+    """
+    species = species or Species.default_store()
+    moves = moves or Moves.default_store()
+    width = max(len(moveset) for moveset in movesets)
+    move_rows = np.full((len(attackers), width), -1)
+    for k, moveset in enumerate(movesets):
+        move_rows[k, :len(moveset)] = [moves.row(name) for name in moveset]
+
+    base = np.stack([species[column] for column in Species.stat_columns], axis=1)
+    type_ids = species.type_ids(generation)
+    attacking = [species.row(name) for name in attackers]
+    defending = [species.row(name) for name in defenders]
+    defender_stats = calc_stats(base[defending], level)
+
+    result = batch_damage(calc_stats(base[attacking], level), type_ids[attacking], move_rows,
+                          defender_stats, type_ids[defending], generation, level, moves)
+    best = result["max"].argmax(axis=1)
+    pick = lambda array: np.take_along_axis(array, best[:, None, :], axis=1)[:, 0, :]
+    hp = defender_stats[:, 0]
+    return {"move": np.array(moves.names(np.take_along_axis(move_rows, best, axis=1))),
+            "min": pick(result["min"]) / hp, "max": pick(result["max"]) / hp,
+            "ko": result["ko"].max(axis=1)}
+
+
+class DamageTest(TestCase):
+    def test_Garchomp_stats(self):
+        expected = [183, 150, 115, 100, 105, 122]
+        actual = calc_stats([108, 130, 95, 80, 85, 102]).tolist()
+        self.assertEqual(actual, expected)
+
+    def test_damage_rolls_single(self):
+        """Level 50, 100 power, 150 Attack vs 100 Defense: base damage 68, STAB and super effective."""
+        expected = [57*3//2*2, 68*3//2*2]
+        damage = damage_rolls(100, 150, 100, True, 2.0)
+        actual = [int(damage[0]), int(damage[-1])]
+        self.assertEqual(actual, expected)
+
+    def test_batch_matches_single(self):
+        matrix = team_damage_matrix(["Garchomp", "Charizard"], [["Earthquake", "Outrage"], ["Flamethrower"]],
+                                    ["Tyranitar", "Scizor", "Charizard"])
+        species = Species.default_store()
+        hp = calc_stats([species[column][species.row("Scizor")] for column in Species.stat_columns])[0]
+        attack = calc_stats([species[column][species.row("Charizard")] for column in Species.stat_columns])[3]
+        defense = calc_stats([species[column][species.row("Scizor")] for column in Species.stat_columns])[4]
+        expected = damage_rolls(90, attack, defense, True, 4.0)[-1] / hp
+        actual = matrix["max"][1, 1]
+        self.assertEqual(actual, expected)
+        self.assertEqual(matrix["move"][0, 0], "Earthquake")
+        self.assertEqual(matrix["ko"][1, 1], 1.0)
+
+    def test_immune_Charizard(self):
+        expected = 0
+        actual = team_damage_matrix(["Garchomp"], [["Earthquake"]], ["Charizard"])["max"][0, 0]
+        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import pickle
+import statistics as st
+import sys
+from functools import lru_cache
+from os import chmod, fdopen, path, remove, replace
+from tempfile import TemporaryDirectory, mkstemp
+from unittest import TestCase, main
+
+import numpy as np
+import pandas as pd
+
+import Matcher
+from Pokemon import Pokemon, def_columns, typing_row
+
+types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
+         "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
+gen_types = {1: 15, 2: 17, 6: 18}
+
+def_labels = ["Defensive Score", "Double Weaknesses", "Weaknesses",
+              "Defensive Neutralities", "Resistances", "Double Resistances", "Immunities"]
+
+sort_dict = {"Defensive Score": [6, 3], "Defensive Attribute": [6, 3], "Double Weaknesses": [2, 0],
+             "Weaknesses": [1, 0], "Defensive Neutralities": [0, 6], "Resistances": [5, 0],
+             "Double Resistances": [4, 0], "Immunities": [0, 3]}
+
+ascend_dict = {"Defensive Score": [False, True, True], "Defensive Attribute": [False, True, True],
+               "Double Weaknesses": [False, False, False], "Weaknesses": [False, False, False],
+               "Defensive Neutralities": [True, False, False], "Resistances": [True, True, False],
+               "Double Resistances": [True, True, False], "Immunities": [True, False, True]}
+
+cache_file = path.join(path.dirname(path.abspath(__file__)), "type_matchups", "def_plots.pickle")
+
+"""
+interactive_def_plots only ever shows a dual type ("None" or a type) of a generation sorted
+by one of def_labels, so everything its callbacks need is computed once per combination:
+response_tables() maps (gen, dual) to a dict with
+- "data": {button: columns for the ColumnDataSource}, button being the index of the sort
+  label in def_labels or None for the initial order (by decreasing Defensive Score)
+- "texts": {label: text of the statistics Div}
+- "regression": {button: (slope, intercept) of the regression line, or None if the
+  column is constant}
+"""
+
+
+def defensive_dataframe(dual, generation=6):
+    """Returns a dataframe with the needed information for the plots."""
+    profiles = Pokemon.batch_def_profiles(generation)
+    rows = [typing_row([element, dual], generation) for element in types[:gen_types[generation]]]
+
+    df = pd.DataFrame({label: profiles[label][rows] for label in def_columns})
+    df.insert(0, "Types", types[:gen_types[generation]])
+    return df
+
+def defensive_analysis(dataframe):
+    """Returns a dataframe with lists of various statistical properties of the different dataframe columns."""
+    """The dataframe includes, in this order: minimum, maximum, (arithmetic) mean, median, mode, standard deviation."""
+    analysis = []
+    for k in def_labels:
+        column = dataframe[k]
+        stats = [np.amin(column), np.amax(column), np.mean(column), st.median(column), st.stdev(column), st.multimode(column)]
+        for i in range(5):
+            stats[i] = round(stats[i], 2)
+        for k in range(len(stats[5])):
+            stats[5][k] = round(stats[5][k], 2)
+        analysis.append(stats)
+    analysis = pd.DataFrame([analysis[i] for i in range(len(analysis))], index=def_labels)
+    analysis = analysis.transpose()
+    return analysis
+
+def stat_text(data):
+    """Returns the text of the DIV displaying a column of defensive_analysis."""
+    return (f"range = [{data[0]}, {data[1]}]" + '</br>' +
+            f"mean = {data[2]}" + '</br>' + f"median = {data[3]}" + '</br>' +
+            f"mode = {data[5][0] if len(data[5])==1 else sorted(data[5])}" + '</br>' +
+            f"standard deviation = {data[4]}")
+
+def source_data(df):
+    """Returns the columns of the ColumnDataSource of the plots as lists."""
+    return dict(Types=df["Types"].tolist(), Defensive_Score=df["Defensive Score"].tolist(),
+                Defensive_Attribute=df["Defensive Attribute"].tolist(), Double_Weaknesses=df["Double Weaknesses"].tolist(),
+                Weaknesses=df["Weaknesses"].tolist(), Defensive_Neutralities=df["Defensive Neutralities"].tolist(),
+                Resistances=df["Resistances"].tolist(), Double_Resistances=df["Double Resistances"].tolist(),
+                Immunities=df["Immunities"].tolist())
+
+
+def response(dual, generation=6):
+    """Computes the entry of response_tables for a dual type of a generation."""
+    df = defensive_dataframe(dual, generation)
+    analysis = defensive_analysis(df)
+    entry = {"data": {None: source_data(df.sort_values(by="Defensive Score", ascending=False, ignore_index=True))},
+             "texts": {label: stat_text(analysis[label]) for label in def_labels},
+             "regression": {}}
+
+    for n, label in enumerate(def_labels):
+        sort_by = [label] + [def_labels[k] for k in sort_dict[label]]
+        ordered = df.sort_values(by=sort_by, ascending=ascend_dict[label], ignore_index=True)
+        entry["data"][n] = source_data(ordered)
+        entry["regression"][n] = None
+        if analysis[label][0] < analysis[label][1]:
+            slope, intercept = np.polyfit(ordered[label], np.arange(start=1, stop=gen_types[generation]+1, step=1), 1)
+            entry["regression"][n] = (float(slope), float(intercept))
+    return entry
+
+def build_tables():
+    """Computes the responses of every dual type ("None" included) of every generation."""
+    return {(gen, dual): response(dual, gen)
+            for gen in Matcher.generations for dual in ["None"] + types[:gen_types[gen]]}
+
+@lru_cache(maxsize=None)
+def response_tables(file=None):
+    """Returns build_tables(), read from the cache file (type_matchups/def_plots.pickle by default).
+
+    The cache only holds lists, numbers and strings and is rebuilt when it is missing,
+    fails to load for any reason (e.g. truncated, or referring to code that is gone) or
+    was computed from other type matchups; it is written to a
+    temporary file which then replaces it, so an interrupted write never leaves a partial
+    cache. Being cached in this module, the tables are shared by all the sessions of a
+    Bokeh server.
+    """
+    file = file or cache_file
+    try:
+        with open(file, "rb") as cache:
+            source_hash, tables = pickle.load(cache)
+        if source_hash == Matcher.source_hash():
+            return tables
+    except Exception:
+        pass
+
+    tables = build_tables()
+    try:
+        handle, temporary = mkstemp(suffix=".pickle", dir=path.dirname(path.abspath(file)))
+        try:
+            with fdopen(handle, "wb") as cache:
+                pickle.dump((Matcher.source_hash(), tables), cache)
+            chmod(temporary, 0o644)
+            replace(temporary, file)
+        finally:
+            if path.exists(temporary):
+                remove(temporary)
+    except OSError:
+        pass
+    return tables
+
+
+class DefensiveTablesTest(TestCase):
+    def test_response_Fire_gen2(self):
+        df = defensive_dataframe("Fire", 2)
+        ordered = df.sort_values(by=["Weaknesses", "Double Weaknesses", "Defensive Score"],
+                                 ascending=ascend_dict["Weaknesses"], ignore_index=True)
+        expected = source_data(ordered)
+        actual = response("Fire", 2)["data"][2]
+        self.assertEqual(actual, expected)
+
+    def test_constant_column_no_regression(self):
+        expected = None
+        actual = response("None", 1)["regression"][def_labels.index("Double Weaknesses")]
+        self.assertEqual(actual, expected)
+
+    def test_truncated_cache_rebuilt(self):
+        with TemporaryDirectory() as directory:
+            file = path.join(directory, "def_plots.pickle")
+            with open(file, "wb") as cache:
+                pickle.dump((Matcher.source_hash(), {"partial": True}), cache)
+            with open(file, "r+b") as cache:
+                cache.truncate(path.getsize(file) - 3)
+            expected = response("Fire", 2)
+            actual = response_tables(file)[2, "Fire"]
+            self.assertEqual(actual, expected)
+            with open(file, "rb") as cache:
+                self.assertEqual(len(pickle.load(cache)[1]), 3 + 15 + 17 + 18)
+
+    def test_stale_cache_rebuilt(self):
+        """Pickles of classes which were removed or moved raise AttributeError or ImportError."""
+        for stale in [b"cDefensiveTables\nRemovedTables\n.", b"cremoved_module\nTables\n.", b"(t."]:
+            with TemporaryDirectory() as directory:
+                file = path.join(directory, "def_plots.pickle")
+                with open(file, "wb") as cache:
+                    cache.write(stale)
+                expected = response("Water", 1)
+                actual = response_tables(file)[1, "Water"]
+                self.assertEqual(actual, expected)
+
+    def test_tables_keys(self):
+        expected = 3 + 15 + 17 + 18
+        actual = len(build_tables())
+        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    if "--build" in sys.argv[1:]:
+        response_tables()
+        print(f"Built the response tables in {cache_file}.")
+    else:
+        main()
@@ -1,31 +1,256 @@
-from pandas import read_csv
-
-def_matchups = {}
-off_matchups = {}
-
-for gen in [1, 2, 6]:
-    """Reading the source files"""
-    def_df = read_csv(f"Type_Matchups/defensive_gen{gen}.txt", delimiter="\t", index_col=0)
-    off_df = read_csv(f"Type_Matchups/offensive_gen{gen}.txt", delimiter="\t", index_col=0)
-
-    """Converting strings to lists of strings"""
-    for col in def_df.keys():
-        for row in def_df.index:
-            if def_df[col][row] == "None":
-                def_df[col][row] = []
-            else:
-                def_df[col][row] = def_df[col][row].split(", ")
-
-    for col in off_df.keys():
-        for row in off_df.index:
-            if off_df[col][row] == "None":
-                off_df[col][row] = []
-            else:
-                off_df[col][row] = off_df[col][row].split(", ")
-
-    """Adding the dataframes to the dictionaries"""
-    def_matchups[gen] = def_df
-    off_matchups[gen] = off_df
+import sys
+from collections.abc import Mapping
+from hashlib import sha256
+from os import chmod, fdopen, path, remove, replace
+from tempfile import TemporaryDirectory, mkstemp
+from unittest import TestCase
+from zipfile import BadZipFile
+
+import numpy as np
+
+types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
+         "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
+gen_types = {1: 15, 2: 17, 6: 18}
+type_index = {name: k for k, name in enumerate(types)}
+
+source_dir = path.join(path.dirname(path.abspath(__file__)), "type_matchups")
+cache_file = path.join(source_dir, "matchups.npz")
+generations = [1, 2, 6]
+
+_effectiveness = {}
+
+
+def source_files():
+    """Returns the paths of the text files the matchups are read from."""
+    return [path.join(source_dir, f"{kind}_gen{gen}.txt")
+            for gen in generations for kind in ["defensive", "offensive"]]
+
+def source_hash():
+    """Returns the sha256 of the source files, used to invalidate the compiled cache."""
+    digest = sha256()
+    for file in source_files():
+        digest.update(path.basename(file).encode())
+        with open(file, "rb") as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+def _to_list(cell):
+    """Converting a cell like "Fire, Water" to ["Fire", "Water"] and "None" to []."""
+    if cell == "None":
+        return []
+    return cell.split(", ")
+
+def parse_matchups(kind, gen):
+    """Reads type_matchups/{kind}_gen{gen}.txt into {type: (list, list, list)}, keeping the file order.
+
+    The lists are resistances, weaknesses and immunities for the "defensive" files and
+    advantages, disadvantages and unsusceptibles for the "offensive" files.
+    """
+    with open(path.join(source_dir, f"{kind}_gen{gen}.txt"), encoding="utf-8") as source:
+        lines = source.read().splitlines()[1:]
+
+    matchups = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        name, *cells = line.split("\t")
+        if len(cells) != 3:
+            raise ValueError(f"Malformed line in {kind}_gen{gen}.txt: {line!r}")
+        matchups[name] = tuple(_to_list(cell.strip()) for cell in cells)
+    return matchups
+
+
+def _encode_lists(matchups):
+    """Packing {type: (list, list, list)} into an int8 array of type indices, padded with -1."""
+    packed = np.full((len(types), 3, len(types)), -1, dtype=np.int8)
+    for name, lists in matchups.items():
+        for k, listing in enumerate(lists):
+            packed[type_index[name], k, :len(listing)] = [type_index[element] for element in listing]
+    return packed
+
+def _decode_lists(packed, gen):
+    """Inverse of _encode_lists for the types of the generation."""
+    return {types[row]: tuple([types[k] for k in packed[row, i].tolist() if k >= 0] for i in range(3))
+            for row in range(gen_types[gen])}
+
+def _build_effectiveness(gen, defensive):
+    """Builds the 18x18 effectiveness matrix of a generation from its defensive matchups."""
+    matrix = np.ones((len(types), len(types)))
+    matrix[gen_types[gen]:, :] = 0
+
+    for defender, (resistances, weaknesses, immunities) in defensive.items():
+        column = type_index[defender]
+        for attacker in resistances:
+            matrix[type_index[attacker], column] = 0.5
+        for attacker in weaknesses:
+            matrix[type_index[attacker], column] = 2
+        for attacker in immunities:
+            matrix[type_index[attacker], column] = 0
+    return matrix
+
+def _compile_arrays():
+    arrays = {"source_hash": np.array(source_hash())}
+    for gen in generations:
+        defensive = parse_matchups("defensive", gen)
+        arrays[f"eff_gen{gen}"] = _build_effectiveness(gen, defensive)
+        arrays[f"def_gen{gen}"] = _encode_lists(defensive)
+        arrays[f"off_gen{gen}"] = _encode_lists(parse_matchups("offensive", gen))
+    return arrays
+
+
+def compile_matchups(target=None):
+    """Compiles the text files into the binary cache (type_matchups/matchups.npz by default).
+
+    For every generation the cache holds the effectiveness matrix ("eff_gen{gen}"), the
+    packed defensive and offensive lists ("def_gen{gen}", "off_gen{gen}") and the hash of
+    the source files it was compiled from. Returns the arrays.
+    The cache is written to a temporary file which then replaces it, so processes loading
+    it concurrently never see a partial file.
+    """
+    arrays = _compile_arrays()
+    target = target or cache_file
+    handle, temporary = mkstemp(suffix=".npz", dir=path.dirname(path.abspath(target)))
+    try:
+        with fdopen(handle, "wb") as file:
+            np.savez(file, **arrays)
+        chmod(temporary, 0o644)
+        replace(temporary, target)
+    finally:
+        if path.exists(temporary):
+            remove(temporary)
+    return arrays
+
+
+_cache_fresh = False
+
+def _load_cache(keys):
+    """Returns the arrays 'keys' of the binary cache, or None if it is missing, corrupt or stale."""
+    try:
+        with np.load(cache_file, allow_pickle=False) as cache:
+            if not _cache_fresh and str(cache["source_hash"]) != source_hash():
+                return None
+            return {key: cache[key] for key in keys}
+    except (OSError, BadZipFile, ValueError, KeyError, EOFError):
+        return None
+
+def _read_cache(keys):
+    """Returns the arrays 'keys' of the binary cache, recompiling it if it is missing, corrupt or stale."""
+    global _cache_fresh
+    arrays = _load_cache(keys)
+    if arrays is not None:
+        _cache_fresh = True
+        return arrays
+    try:
+        arrays = compile_matchups()
+        _cache_fresh = True
+    except OSError:
+        """The cache can not be written, e.g. in a read-only install, so it is parsed instead."""
+        arrays = _compile_arrays()
+    return {key: arrays[key] for key in keys}
+
+def load_generation(gen):
+    """Loads the matchups and the effectiveness matrix of a single generation."""
+    if gen not in generations:
+        raise KeyError(gen)
+    arrays = _read_cache([f"eff_gen{gen}", f"def_gen{gen}", f"off_gen{gen}"])
+
+    matrix = arrays[f"eff_gen{gen}"]
+    matrix.flags.writeable = False
+    _effectiveness[gen] = matrix
+    def_matchups.loaded[gen] = _decode_lists(arrays[f"def_gen{gen}"], gen)
+    off_matchups.loaded[gen] = _decode_lists(arrays[f"off_gen{gen}"], gen)
+
+def preload(*gens):
+    """Loads the given generations (all of them by default) up front, e.g. before serving requests or forking."""
+    for gen in gens or generations:
+        if gen not in _effectiveness:
+            load_generation(gen)
+
+
+class LazyMatchups(Mapping):
+    """Read-only {gen: {type: (list, list, list)}} mapping loading a generation on first access."""
+    def __init__(self):
+        self.loaded = {}
+
+    def __getitem__(self, gen):
+        if gen not in self.loaded:
+            load_generation(gen)
+        return self.loaded[gen]
+
+    def __contains__(self, gen):
+        return gen in generations
+
+    def __iter__(self):
+        return iter(generations)
+
+    def __len__(self):
+        return len(generations)
+
+    def __repr__(self):
+        return f"LazyMatchups(loaded={sorted(self.loaded)})"
+
+
+def_matchups = LazyMatchups()
+off_matchups = LazyMatchups()
+
+
+def effectiveness(gen):
+    """Returns the read-only 18x18 effectiveness matrix of the generation.
+
+    Rows are the attacking types and columns the defending types, both in the order of
+    `types`, so `effectiveness(gen)[type_index["Water"], type_index["Fire"]]` is 2.
+    Types which do not exist in the generation deal no damage (row of 0) and take neutral
+    damage (column of 1), which is how `Types.Type` treats them.
+    """
+    if gen not in _effectiveness:
+        load_generation(gen)
+    return _effectiveness[gen]
+
+
+class MatcherTest(TestCase):
+    def test_compiled_lists_gen2(self):
+        expected = parse_matchups("offensive", 2)
+        actual = _decode_lists(_compile_arrays()["off_gen2"], 2)
+        self.assertEqual(actual, expected)
+
+    def test_Dragon_offensive_gen1(self):
+        expected = ([], [], [])
+        actual = off_matchups[1]["Dragon"]
+        self.assertEqual(actual, expected)
+
+    def test_preload_gen2(self):
+        preload(2)
+        expected = True
+        actual = 2 in def_matchups.loaded and 2 in off_matchups.loaded
+        self.assertEqual(actual, expected)
+
+    def test_truncated_cache_recompiled(self):
+        global cache_file, _cache_fresh
+        saved = cache_file, _cache_fresh
+        with TemporaryDirectory() as directory:
+            cache_file, _cache_fresh = path.join(directory, "matchups.npz"), False
+            try:
+                compile_matchups()
+                with open(cache_file, "r+b") as file:
+                    file.truncate(path.getsize(cache_file) // 2)
+                expected = _compile_arrays()["eff_gen2"].tolist()
+                actual = _read_cache(["eff_gen2"])["eff_gen2"].tolist()
+                self.assertEqual(actual, expected)
+                self.assertIsNotNone(_load_cache(["eff_gen2"]))
+            finally:
+                cache_file, _cache_fresh = saved
+
+    def test_Ghost_Psychic_gen1(self):
+        expected = 0
+        actual = effectiveness(1)[type_index["Ghost"], type_index["Psychic"]]
+        self.assertEqual(actual, expected)
+
 
 if __name__ == "__main__":
-    print(def_matchups)
\ No newline at end of file
+    if "--compile" in sys.argv[1:]:
+        compile_matchups()
+        print(f"Compiled the type matchups to {cache_file}.")
+    else:
+        preload()
+        print(dict(def_matchups))
+        print(effectiveness(6))
@@ -0,0 +1,209 @@
+import sys
+from functools import lru_cache
+from os import path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy as np
+
+from Attacks import Attack
+
+types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
+         "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
+gen_types = {1: 15, 2: 17, 6: 18}
+type_index = {name: k for k, name in enumerate(types)}
+
+move_file = path.join(path.dirname(path.abspath(__file__)), "moves", "moves.txt")
+categories = ["Physical", "Special", "Status"]
+"""The numeric columns of the move file and their dtypes, values out of their range are rejected."""
+number_columns = {"power": np.uint16, "accuracy": np.uint8, "pp": np.uint8, "generation": np.uint8}
+
+"""
+The move file is tab separated with a header line and one move per line:
+Name, Type, Category (one of categories), Power (0 for status moves), Accuracy (0 for
+moves which never miss), PP and the generation the move was introduced in. The values
+are the ones of the latest generation.
+"""
+
+
+class MoveStore:
+    """Column-oriented, read-only store of the moves, one NumPy array per column.
+
+    "name" is a unicode array, "type" holds indices into `types`, "category" indices into
+    categories and "power", "accuracy", "pp" and "generation" are unsigned columns of the
+    dtypes of number_columns.
+    Besides a sorted permutation of the names, the store precomputes:
+    - type_rows[type_offsets[t]:type_offsets[t + 1]], the moves of type t by decreasing power
+    - power_order, the rows sorted by power, for power ranges
+    - best_rows[g - 1, t], the row of the best damaging move of type t available in
+      generation g (highest power, then accuracy, then file order), -1 if there is none
+    """
+    def __init__(self, columns):
+        self.columns = columns
+        for column in columns.values():
+            column.flags.writeable = False
+        n = len(self)
+        self.name_order = np.argsort(columns["name"], kind="stable")
+        self.power_order = np.argsort(columns["power"], kind="stable")
+
+        """Moves which never miss rank above all others of the same power."""
+        accuracy = np.where(columns["accuracy"] == 0, 101, columns["accuracy"].astype(np.int32))
+        order = np.lexsort((np.arange(n), -accuracy, -columns["power"].astype(np.int32), columns["type"]))
+        self.type_rows = order.astype(np.int32)
+        self.type_offsets = np.searchsorted(columns["type"][order], np.arange(len(types) + 1)).astype(np.int32)
+
+        self.max_gen = int(columns["generation"].max(initial=1))
+        self.best_rows = np.full((self.max_gen, len(types)), -1, dtype=np.int32)
+        damaging = order[columns["power"][order] > 0]
+        for gen in range(1, self.max_gen + 1):
+            available = damaging[columns["generation"][damaging] <= gen]
+            present, first = np.unique(columns["type"][available], return_index=True)
+            self.best_rows[gen - 1, present] = available[first]
+        self.best_rows.flags.writeable = False
+
+    def __len__(self):
+        return len(self.columns["name"])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def nbytes(self):
+        """Returns {column: bytes} of the columns and indexes."""
+        sizes = {column: array.nbytes for column, array in self.columns.items()}
+        sizes["name index"] = self.name_order.nbytes
+        sizes["type index"] = self.type_offsets.nbytes + self.type_rows.nbytes
+        sizes["power index"] = self.power_order.nbytes
+        sizes["best moves"] = self.best_rows.nbytes
+        return sizes
+
+    def row(self, name):
+        """Returns the row of a move, raising NotImplementedError for unknown names."""
+        names = self.columns["name"]
+        k = int(np.searchsorted(names, name, sorter=self.name_order))
+        if k == len(names) or names[self.name_order[k]] != name:
+            raise NotImplementedError(f"Move {name} not recognized.")
+        return int(self.name_order[k])
+
+    def names(self, rows):
+        return self.columns["name"][rows].tolist()
+
+    def _gen_row(self, generation):
+        """Generations after the last one of the file have the moves of the last one."""
+        if generation%1 != 0 or generation < 1:
+            raise NotImplementedError(f"Generation {generation} not recognized.")
+        return min(int(generation), self.max_gen) - 1
+
+    def best_move(self, element, generation=6):
+        """Returns the row of the best damaging move of a type available in a generation, or -1."""
+        if element not in type_index:
+            raise NotImplementedError(f"Type {element} not recognized.")
+        return int(self.best_rows[self._gen_row(generation), type_index[element]])
+
+    def best_moves(self, generation=6):
+        """Returns the rows of best_move for every type, in the order of `types`."""
+        return self.best_rows[self._gen_row(generation)]
+
+    def best_powers(self, generation=6):
+        """Returns the power of best_move for every type in the order of `types`, 0 if there is none."""
+        rows = self.best_moves(generation)
+        return np.where(rows >= 0, self.columns["power"][rows], 0)
+
+    def moves_of_type(self, element, generation=None):
+        """Returns the rows of the moves of a type by decreasing power, only those available in 'generation' if given."""
+        if element not in type_index:
+            raise NotImplementedError(f"Type {element} not recognized.")
+        t = type_index[element]
+        rows = self.type_rows[self.type_offsets[t]:self.type_offsets[t + 1]]
+        if generation is not None:
+            rows = rows[self.columns["generation"][rows] <= generation]
+        return rows
+
+    def with_power(self, low, high=None):
+        """Returns the rows of the moves with low <= power <= high, by increasing power."""
+        power = self.columns["power"]
+        start = np.searchsorted(power, low, side="left", sorter=self.power_order)
+        stop = len(self) if high is None else np.searchsorted(power, high, side="right", sorter=self.power_order)
+        return self.power_order[start:stop]
+
+    def attack(self, move, generation=6):
+        """Returns the Attack of a move given by name or row."""
+        row = self.row(move) if isinstance(move, str) else int(move)
+        return Attack(str(self.columns["name"][row]), types[self.columns["type"][row]], generation,
+                      int(self.columns["power"][row]), int(self.columns["pp"][row]))
+
+
+def _index(cell, names, line):
+    if cell not in names:
+        raise ValueError(f"Unknown value {cell!r} in the move file: {line!r}")
+    return names.index(cell)
+
+def load_moves(file=None):
+    """Reads the move file (moves/moves.txt by default) into a MoveStore."""
+    with open(file or move_file, encoding="utf-8") as source:
+        lines = [line for line in source.read().splitlines()[1:] if line.strip()]
+
+    names, move_types, move_categories, numbers = [], [], [], []
+    for line in lines:
+        cells = [cell.strip() for cell in line.split("\t")]
+        if len(cells) != 7:
+            raise ValueError(f"Malformed line in the move file: {line!r}")
+        names.append(cells[0])
+        move_types.append(_index(cells[1], types, line))
+        move_categories.append(_index(cells[2], categories, line))
+        numbers.append([int(cell) for cell in cells[3:]])
+
+    numbers = np.array(numbers, dtype=np.int64).reshape(-1, 4)
+    columns = {"name": np.array(names, dtype=str), "type": np.array(move_types, dtype=np.int8),
+               "category": np.array(move_categories, dtype=np.int8)}
+    for k, (column, dtype) in enumerate(number_columns.items()):
+        if len(numbers) and not (0 <= numbers[:, k].min() and numbers[:, k].max() <= np.iinfo(dtype).max):
+            raise ValueError(f"Value out of range in the {column} column of the move file.")
+        columns[column] = numbers[:, k].astype(dtype)
+    return MoveStore(columns)
+
+@lru_cache(maxsize=None)
+def default_store():
+    """Returns the MoveStore of moves/moves.txt, loaded once."""
+    return load_moves()
+
+
+class MovesTest(TestCase):
+    store = default_store()
+
+    def test_best_Fire_move_gen1(self):
+        expected = "Fire Blast"
+        actual = self.store.names(self.store.best_move("Fire", 1))
+        self.assertEqual(actual, expected)
+
+    def test_best_Fairy_move_gen2(self):
+        expected = -1
+        actual = self.store.best_move("Fairy", 2)
+        self.assertEqual(actual, expected)
+
+    def test_best_Fighting_moves_accuracy(self):
+        expected = ["Close Combat", "Focus Blast", "Cross Chop", "Aura Sphere", "Karate Chop"]
+        actual = self.store.names(self.store.moves_of_type("Fighting"))
+        self.assertEqual(actual, expected)
+
+    def test_power_above_255(self):
+        with TemporaryDirectory() as directory:
+            file = path.join(directory, "moves.txt")
+            with open(file, "w", encoding="utf-8") as moves:
+                moves.write("Name\tType\tCategory\tPower\tAccuracy\tPP\tGeneration\nHuge Move\tNormal\tPhysical\t300\t100\t5\t1\n")
+            expected = 300
+            actual = int(load_moves(file)["power"][0])
+            self.assertEqual(actual, expected)
+
+    def test_with_power(self):
+        expected = sorted(name for name, power in zip(self.store["name"].tolist(), self.store["power"].tolist())
+                          if 120 <= power <= 130)
+        actual = sorted(self.store.names(self.store.with_power(120, 130)))
+        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    if "--summary" in sys.argv[1:]:
+        store = default_store()
+        print(f"{len(store)} moves, bytes per column: {store.nbytes()}")
+    else:
+        main()
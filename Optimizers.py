@@ -0,0 +1,230 @@
+import warnings
+from heapq import heappush, heappushpop
+from math import exp
+from time import perf_counter
+from unittest import TestCase, main
+
+import numpy as np
+
+"""
+The optimizers search multisets of 'slots' candidates, represented as sorted tuples of
+candidate indices. They only see the objective, a function scoring a batch of such states
+(an int array of shape (batch, depth)) where higher is better; partial states with fewer
+than 'slots' candidates have to be scored as well, which beam_search relies on.
+"""
+
+
+class Budget:
+    """Stops a search after 'seconds' or after 'evaluations' scored states, whatever comes first."""
+    def __init__(self, seconds=None, evaluations=None):
+        self.seconds = seconds
+        self.evaluations = evaluations
+        self.spent = 0
+        self.start = perf_counter()
+
+    def elapsed(self):
+        return perf_counter() - self.start
+
+    def exhausted(self):
+        if self.evaluations is not None and self.spent >= self.evaluations:
+            return True
+        return self.seconds is not None and self.elapsed() >= self.seconds
+
+
+class Search:
+    """Bookkeeping shared by the optimizers: budget, top_k distinct states and convergence history."""
+    def __init__(self, objective, budget, top_k=5):
+        self.objective = objective
+        self.budget = budget
+        self.top_k = top_k
+        self.heap = []
+        self.kept = set()
+        self.best = -np.inf
+        self.history = []
+
+    def score(self, states):
+        """Scores a batch of states, charging the budget and recording complete ones with record()."""
+        states = np.asarray(states, dtype=np.intp)
+        scores = self.objective(states)
+        self.budget.spent += len(states)
+        return scores
+
+    def record(self, states, scores):
+        for state, score in zip(states, scores.tolist()):
+            state = tuple(sorted(int(k) for k in state))
+            if score > self.best:
+                self.best = score
+                self.history.append((self.budget.spent, self.budget.elapsed(), score))
+            if state in self.kept:
+                continue
+            if len(self.heap) < self.top_k:
+                heappush(self.heap, (score, state))
+                self.kept.add(state)
+            elif score > self.heap[0][0]:
+                _, dropped = heappushpop(self.heap, (score, state))
+                self.kept.add(state)
+                self.kept.discard(dropped)
+
+    def result(self, **stats):
+        """Returns {"best": [(state, score)] best first, "evaluations", "seconds", "history", **stats}."""
+        return {"best": [(list(state), score) for score, state in sorted(self.heap, reverse=True)],
+                "evaluations": self.budget.spent, "seconds": self.budget.elapsed(),
+                "history": self.history, **stats}
+
+
+def beam_search(objective, candidates, slots, budget=None, top_k=5, beam_width=20, rng=None):
+    """Fills the slots one by one, keeping the beam_width best partial states at every depth.
+
+    The beam is extended state by state, best first, and the budget is checked after every
+    state: once it is exhausted the rest of the beam is dropped and the remaining depths
+    are filled greedily (beam width 1), so the search always returns complete states.
+    rng breaks ties between equally scored states at random, without it they are kept in
+    enumeration order.
+    """
+    search = Search(objective, budget or Budget(), top_k)
+    beam = [()]
+    for depth in range(slots):
+        width = 1 if search.budget.exhausted() else beam_width
+        states, scores = [], []
+        for state in beam:
+            """Extending the state by all candidates not smaller than its last one, keeping multisets sorted."""
+            states.append(np.array([state + (k,) for k in range((state or (0,))[-1], candidates)]))
+            scores.append(search.score(states[-1]))
+            if search.budget.exhausted():
+                break
+        states, scores = np.concatenate(states), np.concatenate(scores)
+        if rng is None:
+            keep = np.argsort(-scores, kind="stable")[:width]
+        else:
+            keep = np.lexsort((rng.random(len(scores)), -scores))[:width]
+        beam = [tuple(states[k].tolist()) for k in keep]
+        if depth == slots - 1:
+            search.record(states, scores)
+    return search.result(depths=slots)
+
+def hill_climbing(objective, candidates, slots, budget=None, top_k=5, restarts=None, rng=None):
+    """Steepest ascent from random states: every step scores all states differing in one slot.
+
+    Restarts from a new random state at every local optimum until the budget (or the number
+    of restarts) is exhausted.
+    """
+    rng = rng or np.random.default_rng()
+    search = Search(objective, budget or Budget(evaluations=100000), top_k)
+    climbs = 0
+    while not search.budget.exhausted() and (restarts is None or climbs <= restarts):
+        climbs += 1
+        state = np.sort(rng.integers(candidates, size=slots))
+        score = search.score(state[None, :])[0]
+        search.record(state[None, :], np.array([score]))
+        while not search.budget.exhausted():
+            neighbours = np.repeat(state[None, :], slots*candidates, axis=0)
+            neighbours[np.arange(slots*candidates), np.repeat(np.arange(slots), candidates)] = np.tile(np.arange(candidates), slots)
+            scores = search.score(neighbours)
+            search.record(neighbours, scores)
+            best = int(np.argmax(scores))
+            if scores[best] <= score:
+                break
+            state, score = np.sort(neighbours[best]), scores[best]
+    return search.result(restarts=climbs - 1)
+
+def simulated_annealing(objective, candidates, slots, budget=None, top_k=5, temperature=2.0,
+                        cooling=0.999, batch=64, min_temperature=1e-3, rng=None):
+    """Replaces one random slot at a time, accepting worse states with probability exp(delta/T).
+
+    Proposals are scored in batches of 'batch' to amortize the objective and considered in
+    order until one is accepted; only the proposals considered are charged to the budget and
+    recorded, the rest of the batch is discarded. T is multiplied by 'cooling' after every
+    proposal considered but never falls below min_temperature, so long runs keep accepting
+    the occasional worse state instead of turning into a greedy search.
+    """
+    rng = rng or np.random.default_rng()
+    search = Search(objective, budget or Budget(evaluations=100000), top_k)
+    state = np.sort(rng.integers(candidates, size=slots))
+    score = search.score(state[None, :])[0]
+    search.record(state[None, :], np.array([score]))
+    accepted = 0
+
+    while not search.budget.exhausted():
+        """Proposals are independent moves away from the current state, never more than the evaluations left."""
+        size = batch
+        if search.budget.evaluations is not None:
+            size = min(batch, search.budget.evaluations - search.budget.spent)
+        proposals = np.repeat(state[None, :], size, axis=0)
+        proposals[np.arange(size), rng.integers(slots, size=size)] = rng.integers(candidates, size=size)
+        scores = search.objective(proposals)
+        considered = size
+        for k in range(size):
+            delta = float(scores[k] - score)
+            accept = delta >= 0 or rng.random() < exp(delta/temperature)
+            temperature = max(temperature*cooling, min_temperature)
+            if accept:
+                state, score = np.sort(proposals[k]), scores[k]
+                accepted += 1
+                considered = k + 1
+                break
+        search.budget.spent += considered
+        search.record(proposals[:considered], scores[:considered])
+    return search.result(accepted=accepted, temperature=temperature)
+
+
+"""The optimizers Team.optimize can use."""
+optimizers = {"beam": beam_search, "hill": hill_climbing, "annealing": simulated_annealing}
+
+
+class OptimizersTest(TestCase):
+    """A separable toy objective whose optimum is known: the sum of the candidate values."""
+    values = np.array([3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0])
+
+    def objective(self, states):
+        return self.values[states].sum(axis=1)
+
+    def test_beam_search_optimum(self):
+        expected = [5, 5, 5]
+        actual = beam_search(self.objective, 8, 3)["best"][0][0]
+        self.assertEqual(actual, expected)
+
+    def test_beam_search_budget_within_depth(self):
+        result = beam_search(self.objective, 8, 3, budget=Budget(evaluations=10))
+        expected = [3, 8 + 3 + 3]
+        actual = [len(result["best"][0][0]), result["evaluations"]]
+        self.assertEqual(actual, expected)
+
+    def test_beam_search_rng_ties(self):
+        values = np.ones(8)
+        result = beam_search(lambda states: values[states].sum(axis=1), 8, 2, beam_width=1, rng=np.random.default_rng(0))
+        expected = 2.0
+        actual = result["best"][0][1]
+        self.assertEqual(actual, expected)
+
+    def test_hill_climbing_budget(self):
+        result = hill_climbing(self.objective, 8, 3, budget=Budget(evaluations=500), rng=np.random.default_rng(0))
+        expected = 27.0
+        actual = result["best"][0][1]
+        self.assertEqual(actual, expected)
+        self.assertLess(result["evaluations"], 500 + 3*8)
+
+    def test_simulated_annealing_history(self):
+        result = simulated_annealing(self.objective, 8, 3, budget=Budget(evaluations=2000), rng=np.random.default_rng(1))
+        expected = sorted(score for _, _, score in result["history"])
+        actual = [score for _, _, score in result["history"]]
+        self.assertEqual(actual, expected)
+
+    def test_simulated_annealing_min_temperature(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            result = simulated_annealing(self.objective, 8, 3, budget=Budget(evaluations=200000), cooling=0.9,
+                                         rng=np.random.default_rng(2))
+        expected = 1e-3
+        actual = result["temperature"]
+        self.assertEqual(actual, expected)
+
+    def test_simulated_annealing_charges_considered(self):
+        """The first state and every proposal considered are charged once and cool T once."""
+        result = simulated_annealing(self.objective, 8, 3, budget=Budget(evaluations=101), cooling=0.99,
+                                     rng=np.random.default_rng(3))
+        self.assertEqual(result["evaluations"], 101)
+        self.assertAlmostEqual(result["temperature"], 2.0*0.99**100)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,129 +1,335 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from heapq import heapify, heappop
+from itertools import combinations, product, repeat
+from tempfile import TemporaryDirectory
 from unittest import TestCase, main
 
-from Types import Type
+import numpy as np
+
+import Coverage
+import Matcher
+import Moves
+import Species
+from Types import Type, normalize_gen, typings, typing_row
 from Attacks import Attack
 
 types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
          "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
 gen_types = {1: 15, 2: 17, 6: 18}
+def_columns = ["Defensive Score", "Defensive Attribute", "Double Weaknesses", "Weaknesses",
+               "Defensive Neutralities", "Resistances", "Double Resistances", "Immunities"]
+
+
+def _coverage_chunk(chunk, generation, moves, given, STAB, engine):
+    """Worker of Pokemon.coverage_for_all_typings, runs get_off_coverage for a chunk of typings."""
+    return [Pokemon(None, typing, generation).get_off_coverage(moves, given, STAB, engine) for typing in chunk]
+
+
+"""The multipliers listed by def_inv_table and off_inv_table, in the order of their keys."""
+# def_multipliers = [4, 2, 1, 0.5, 0.25, 0]
+def_multipliers = [2**k for k in range(5, -8, -1)] + [0]
+off_multipliers = [3, 2, 1.5, 1, 0.75, 0.5, 0]
+
+
+def _inverse_table(vector, n, multipliers):
+    """Returns {multiplier: [types]} of types[:n] by their multiplier in vector."""
+    inv_table = {multiplier: [] for multiplier in multipliers}
+    for element, value in zip(types[:n], vector.tolist()):
+        inv_table[value].append(element)
+    return inv_table
+
+def _with_multipliers(vector, n, *multipliers):
+    """Returns the types of types[:n] taking one of the multipliers in vector, grouped by multiplier."""
+    values = vector.tolist()
+    return [element for multiplier in multipliers for element, value in zip(types[:n], values) if value == multiplier]
+
+
+@lru_cache(maxsize=None)
+def _additions(n, new_moves):
+    """Returns the additions exhaustive_off_coverage scores for 'new_moves' new moves among n types.
+
+    Every set of 1 to max(new_moves, 1) type indices (none for more than 4 new moves) appears
+    once, as a tuple, in the order nested loops over the types first reach it.
+    """
+    additions = {}
+    if new_moves <= 2:
+        for i in range(n):
+            additions[frozenset([i])] = (i,)
+    if new_moves == 2:
+        for i, j in product(range(n), repeat=2):
+            if i != j:
+                additions.setdefault(frozenset([i, j]), (i, j))
+    if new_moves in [3, 4]:
+        for combination in product(range(n), repeat=new_moves):
+            additions.setdefault(frozenset(combination), tuple(sorted(set(combination))))
+    return list(additions.values())
+
+
+@lru_cache(maxsize=4096)
+def _def_matchups(typing, generation, gen):
+    """Computes the defensive vector and score of a typing given as ((name, gen), ...), see get_def_matchups."""
+    n = gen_types[generation]
+
+    """The multipliers of all typings are multiplied column-wise in the effectiveness matrix."""
+    def_vector = np.ones(n)
+    for name, type_gen in typing:
+        def_vector *= Type(name, type_gen).def_vector
+    def_vector.flags.writeable = False
+
+    def_score = float(def_vector.sum()) - n
+    if def_score%1 == 0:
+        def_score = int(def_score)
+    return def_vector, def_score
+
+@lru_cache(maxsize=4096)
+def _off_matchups(typing_str, gen, moves, STAB):
+    """Computes the offensive vector and score of moves given as ((type, gen), ...), see get_off_matchups.
+
+    The rows of the moves are taken from the type chart of the Pokemon, whatever generation
+    the moves were created for, so a move of a type this chart does not have is rejected.
+    """
+    n = gen_types[gen]
+
+    """Every target takes the maximal multiplier of the rows of the moves."""
+    off_vector = np.zeros(n)
+    for move_type, move_gen in moves:
+        if move_type not in types[:n]:
+            raise NotImplementedError(f"Type '{move_type}' not recognized in generation {gen}.")
+        fac = 1
+        if move_type in typing_str and STAB:
+            fac = 1.5
+        np.maximum(off_vector, fac*Type(move_type, gen).off_vector, out=off_vector)
+    off_vector.flags.writeable = False
+
+    off_score = float(off_vector.sum())
+    if off_score%1 == 0:
+        off_score = int(off_score)
+    return off_vector, off_score
+
 
 class Pokemon:
+    """Pokemon are kept small since team searches hold a lot of them: the multipliers taken and
+    dealt are the read-only def_vector and off_vector indexed like types, shared with every
+    Pokemon of the same typing (and moves), and def_table, def_inv_table, d_weak, ... are
+    properties derived from them on access, so they must be read again after a change.
+    gen is the generation of the type chart (1, 2 or 6) and generation the game generation
+    the Pokemon was created for, which decides the moves available in a Moves store;
+    def_gen is the type chart def_vector was computed for, see get_def_matchups."""
+    __slots__ = ("gen", "generation", "species", "def_attr", "def_score", "def_vector", "def_gen", "off_score", "off_vector",
+                 "coverage_dict", "inv_coverage_dict", "top_coverage", "pareto_coverage", "max_coverage",
+                 "_typing", "_typing_str", "_moves", "_def_key", "_off_key")
+
     def __init__(self, species, typing, generation=6):
+        self.generation = generation
         self.gen = generation
         if self.gen%1!=0 or self.gen < 1:
             raise NotImplementedError(f"Generation {generation} not recognized.")
         while self.gen not in [1, 2, 6] and self.gen > 0:
             self.gen = self.gen - 1
 
+        self.set_typing(typing)
+        self.species = species
+        self.moves = []
+
+        self.get_def_matchups()
+        self.get_off_matchups()
+
+    @classmethod
+    def from_species(cls, name, generation=6, store=None):
+        """Builds the Pokemon of a species of the species store (Species.load_species() by default)."""
+        store = store or Species.default_store()
+        return cls(name, store.typing(name, generation), generation)
+
+    """typing, typing_str and moves can only be replaced through their setters, which
+    invalidate the results memoized by get_def_matchups and get_off_matchups."""
+    @property
+    def typing(self):
+        return self._typing
+
+    @typing.setter
+    def typing(self, typing):
+        self._typing = list(typing)
+        self._typing_str = [element.type for element in self._typing]
+        self._def_key = self._off_key = None
+
+    @property
+    def typing_str(self):
+        return self._typing_str
+
+    @typing_str.setter
+    def typing_str(self, typing_str):
+        self.typing = [Type(element, self.gen) for element in typing_str]
+
+    def set_typing(self, typing):
+        """Sets the typing from type names, dropping duplicates and None."""
         typing = list(set(typing))
         if None in typing:
             typing.remove(None)
         if "None" in typing:
             typing.remove("None")
-        self.typing = [Type(typing[k], self.gen) for k in range(len(typing))]
         self.typing_str = typing
 
-        self.species = species
-        self.moves = []
+    @property
+    def moves(self):
+        """The moveset as a tuple, use set_move, set_moves_by_type or reset_moves to change it."""
+        return self._moves
 
-        self.get_def_matchups()
-        self.get_off_matchups()
+    @moves.setter
+    def moves(self, moves):
+        self._moves = tuple(moves)
+        self._off_key = None
 
     def get_def_matchups(self, generation=None):
-        if generation == None:
-            generation = self.gen
-        self.weaknesses = []
-        self.resistances = []
-        self.immunities = []
-        self.def_neutral = types[:gen_types[generation]]
-        self.def_table = {}
-        self.def_score = 0
-        self.d_weak = []
-        self.d_rest = []
-
-        for element in types[:gen_types[generation]]:
-            self.def_table[element] = 1
-
-        for i in range(len(self.typing)):
-            self.weaknesses.extend(self.typing[i].weaknesses)
-            self.resistances.extend(self.typing[i].resistances)
-            self.immunities.extend(self.typing[i].immunities)
-
-            for element in types[:gen_types[generation]]:
-                self.def_table[element] *= self.typing[i].def_table[element]
-
-        # self.def_inv_table = {4: [], 2: [], 1: [], 0.5: [], 0.25: [], 0: []}
-        self.def_inv_table = {2**k: [] for k in range(5, -8, -1)}
-        self.def_inv_table[0] = []
-        for key in types[:gen_types[self.gen]]:
-            self.def_inv_table[self.def_table[key]].append(key)
-
-        self.d_weak = self.def_inv_table[4]
-        self.weaknesses = self.def_inv_table[2]
-        self.def_neutral = self.def_inv_table[1]
-        self.resistances = self.def_inv_table[0.5]
-        self.d_rest = self.def_inv_table[0.25]
-        self.immunities = self.def_inv_table[0] 
-
-        for key in types[:gen_types[generation]]:
-            self.def_score += self.def_table[key]-1
+        """Computes the multipliers taken in the type chart of 'generation', self.gen by default."""
+        generation = self.gen if generation == None else normalize_gen(generation)
         self.def_attr = 0
+        key = (tuple(sorted((element.type, generation) for element in self.typing)), generation, self.gen)
+        if key == self._def_key:
+            return
+
+        self.def_vector, self.def_score = _def_matchups(*key)
+        self.def_gen = generation
+        self._def_key = key
 
     def get_off_matchups(self, STAB=True):
-        self.advantages = []
-        self.disadvantages = []
-        self.unsusceptibles = []
-        self.off_neutral = types[:gen_types[self.gen]]
-        self.off_table = {}
-        self.off_score = 0
-
-        for element in types[:gen_types[self.gen]]:
-            self.off_table[element] = 0
-            for attack in self.moves:
-                fac = 1
-                if attack.type in self.typing_str and STAB:
-                    fac = 1.5
-                self.off_table[element] = max(self.off_table[element], fac*attack.off_table[element])
-
-        self.off_inv_table = {3: [], 2: [], 1.5: [], 1: [], 0.75: [], 0.5: [], 0: []}
-        for key in types[:gen_types[self.gen]]:
-            self.off_inv_table[self.off_table[key]].append(key)
-
-        self.advantages = self.off_inv_table[2] + self.off_inv_table[3]
-        self.off_neutral = self.off_inv_table[1] + self.off_inv_table[1.5]
-        self.disadvantages = self.off_inv_table[0.5] + self.off_inv_table[0.75]
-        self.unsusceptibles = self.off_inv_table[0] 
-
-        for key in types[:gen_types[self.gen]]:
-            self.off_score += self.off_table[key]
+        key = (tuple(self.typing_str), self.gen, tuple((attack.type, attack.gen) for attack in self.moves), STAB)
+        if key == self._off_key:
+            return self.off_score
+
+        self.off_vector, self.off_score = _off_matchups(*key)
+        self._off_key = key
         return self.off_score
 
+    @property
+    def def_table(self):
+        return dict(zip(types, self.def_vector.tolist()))
+
+    @property
+    def def_inv_table(self):
+        return _inverse_table(self.def_vector, gen_types[self.def_gen], def_multipliers)
+
+    @property
+    def d_weak(self):
+        return _with_multipliers(self.def_vector, gen_types[self.def_gen], 4)
+
+    @property
+    def weaknesses(self):
+        return _with_multipliers(self.def_vector, gen_types[self.def_gen], 2)
+
+    @property
+    def def_neutral(self):
+        return _with_multipliers(self.def_vector, gen_types[self.def_gen], 1)
+
+    @property
+    def resistances(self):
+        return _with_multipliers(self.def_vector, gen_types[self.def_gen], 0.5)
+
+    @property
+    def d_rest(self):
+        return _with_multipliers(self.def_vector, gen_types[self.def_gen], 0.25)
+
+    @property
+    def immunities(self):
+        return _with_multipliers(self.def_vector, gen_types[self.def_gen], 0)
+
+    @property
+    def off_table(self):
+        return dict(zip(types, self.off_vector.tolist()))
+
+    @property
+    def off_inv_table(self):
+        return _inverse_table(self.off_vector, gen_types[self.gen], off_multipliers)
+
+    @property
+    def advantages(self):
+        return _with_multipliers(self.off_vector, gen_types[self.gen], 2, 3)
+
+    @property
+    def off_neutral(self):
+        return _with_multipliers(self.off_vector, gen_types[self.gen], 1, 1.5)
+
+    @property
+    def disadvantages(self):
+        return _with_multipliers(self.off_vector, gen_types[self.gen], 0.5, 0.75)
+
+    @property
+    def unsusceptibles(self):
+        return _with_multipliers(self.off_vector, gen_types[self.gen], 0)
+
     def set_move(self, moves):
         for move in moves:
             if len(self.moves) < 4:
-                self.moves.append(move)
+                self.moves = self.moves + (move,)
                 self.get_off_matchups()
 
-    def set_moves_by_type(self, typings, STAB=True, generation=None):
-        self.reset_moves()
+    def set_moves_by_type(self, typings, STAB=True, generation=None, store=None):
+        """Sets a move of every type, the best move of the type in a Moves store if given, else a generic move.
+
+        The moves of the store are the ones available in 'generation', self.generation by default.
+        """
         if generation == None:
-            generation = self.gen
+            generation = self.generation
 
+        moves = []
         for typing in typings:
-            move = Attack(f"generic {typing} move", typing, generation)
-            self.moves.append(move)
+            row = store.best_move(typing, generation) if store is not None else -1
+            if row >= 0:
+                moves.append(store.attack(row, generation))
+            else:
+                moves.append(Attack(f"generic {typing} move", typing, generation))
+        self.moves = moves
         return self.get_off_matchups(STAB)
 
+    def off_scorer(self, given=[], STAB=True):
+        """Returns a Coverage.Scorer of the move types (as indices in types) added to the given ones.
+
+        scorer.score(combination) is the off_score set_moves_by_type(given + the types of the
+        combination) would return, as a numpy float, but neither moves nor tables are built.
+        """
+        rows = Coverage.coverage_rows(self.typing_str, self.gen, STAB)
+        return Coverage.Scorer(rows, Coverage.coverage_base(rows, given))
+
     def reset_moves(self):
         self.moves = []
 
     def get_moveset(self):
         return self.moves
 
-    def get_off_coverage(self, moves=2, given=[], STAB=True):
-        """This function aims to maximize self.off_score."""
+    def get_off_coverage(self, moves=2, given=[], STAB=True, engine="bound", top_k=None, weighting="type",
+                         pareto=False):
+        """This function aims to maximize self.off_score.
+
+        self.max_coverage maps the number of added move types to the list of the best
+        additions and their score, and 0 to the given move types and their score.
+        engine="bound" searches the combinations with branch and bound, engine="bitset" scores
+        them with bitmasks per multiplier tier, engine="exhaustive" scores every addition and
+        keeps them in self.coverage_dict and self.inv_coverage_dict. All of them keep the
+        top_k additions of every size in self.top_coverage as (addition, score) if top_k is
+        set, in a heap of at most top_k entries.
+        pareto=True also keeps the additions of every size on the Pareto front of (off_score,
+        unsusceptibles, advantages), i.e. the most score, the fewest targets taking 0 and the
+        most targets taking 2 or more, in self.pareto_coverage as (addition, (off_score,
+        number of unsusceptibles, number of advantages)) by decreasing score.
+        weighting="power" picks concrete moves instead: every type is represented by its best
+        move in Moves.default_store() available in the generation, its multipliers are
+        weighted by power/100 and types without a move are left out. The additions are then
+        reported as move names and 0 maps to the moves of the given types; only
+        engine="bound" supports it, without pareto.
+        """
+        if weighting == "power" and pareto:
+            raise NotImplementedError("Pareto fronts not supported with power weighting.")
+        if weighting == "power":
+            return self.get_power_coverage(moves, given, STAB, engine, top_k)
+        if weighting != "type":
+            raise NotImplementedError(f"Weighting '{weighting}' not recognized.")
+
         self.coverage_dict = {1: {}, 2: {}, 3: {}, 4: {}}
         self.inv_coverage_dict = {1: {}, 2: {}, 3: {}, 4: {}}
+        self.top_coverage = {}
+        self.pareto_coverage = {}
         self.max_coverage = {}
         baseline = given
         set_moves = len(given)
@@ -131,109 +337,255 @@ class Pokemon:
             self.max_coverage[0] = (baseline, self.set_moves_by_type(baseline, STAB))
             self.reset_moves()
 
-        if moves - set_moves <= 2:
-            for element in types[:gen_types[self.gen]]:
-                typing = baseline + [element]
-                value = self.set_moves_by_type(typing, STAB)
-                self.coverage_dict[1][element] = value
-                if value in self.inv_coverage_dict[1].keys():
-                    self.inv_coverage_dict[1][value].append(element)
-                else:
-                    self.inv_coverage_dict[1][value] = [element]
-                # self.reset_moves()
-            max_key = max(self.inv_coverage_dict[1].keys())
-            self.max_coverage[1] = (self.inv_coverage_dict[1][max_key], max_key)
-
-        if moves - set_moves == 2:
-            for element in types[:gen_types[self.gen]]:
-                for power in types[:gen_types[self.gen]]:
-                    if element == power:
-                        continue
-                    adding = sorted([element, power])
-                    added = tuple(adding)
-                    if added in self.coverage_dict[2].keys():
-                        continue
-
-                    typing = baseline + adding
-                    value = self.set_moves_by_type(typing, STAB)
-                    self.coverage_dict[2][added] = value
-                    if value in self.inv_coverage_dict[2].keys():
-                        self.inv_coverage_dict[2][value].append(added)
-                    else:
-                        self.inv_coverage_dict[2][value] = [added]
-                    self.reset_moves()
-            max_key = max(self.inv_coverage_dict[2].keys())
-            self.max_coverage[2] = (self.inv_coverage_dict[2][max_key], max_key)
-
-        if moves - set_moves == 3:
-            for element in types[:gen_types[self.gen]]:
-                for power in types[:gen_types[self.gen]]:
-                    for force in types[:gen_types[self.gen]]:
-
-                        adding = sorted(list(set([element, power, force])))
-                        added = tuple(adding)
-                        key = 3
-                        if element == power or element == force or power == force:
-                            key = 2
-                        if element == power and power == force:
-                            key = 1
-                            adding = [force]
-                            added = force
-                        if added in self.coverage_dict[key].keys():
-                            continue
-
-                        typing = baseline + adding
-                        value = self.set_moves_by_type(typing, STAB)
-                        self.coverage_dict[key][added] = value
-                        if value in self.inv_coverage_dict[key].keys():
-                            self.inv_coverage_dict[key][value].append(added)
-                        else:
-                            self.inv_coverage_dict[key][value] = [added]
-                        self.reset_moves()
-
-            for key in [1, 2, 3]:
-                max_key = max(self.inv_coverage_dict[key].keys())
-                self.max_coverage[key] = (self.inv_coverage_dict[key][max_key], max_key)
-
-        if moves - set_moves == 4:
-            for element in types[:gen_types[self.gen]]:
-                for power in types[:gen_types[self.gen]]:
-                    for force in types[:gen_types[self.gen]]:
-                        for spell in types[:gen_types[self.gen]]:
-
-                            adding = sorted(list(set([element, power, force, spell])))
-                            added = tuple(adding)
-                            key = len(adding)
-                            if key == 1:
-                                adding = [force]
-                                added = force
-                            if added in self.coverage_dict[key].keys():
-                                continue
-
-                            typing = baseline + adding
-                            value = self.set_moves_by_type(typing, STAB)
-                            self.coverage_dict[key][added] = value
-                            if value in self.inv_coverage_dict[key].keys():
-                                self.inv_coverage_dict[key][value].append(added)
-                            else:
-                                self.inv_coverage_dict[key][value] = [added]
-                            self.reset_moves()
-
-            for key in [1, 2, 3, 4]:
-                max_key = max(self.inv_coverage_dict[key].keys())
-                self.max_coverage[key] = (self.inv_coverage_dict[key][max_key], max_key)
+        if engine == "exhaustive":
+            self.exhaustive_off_coverage(moves - set_moves, baseline, STAB, top_k)
+        elif engine in Coverage.engines:
+            self.search_off_coverage(moves - set_moves, baseline, STAB, top_k, engine)
+        else:
+            raise NotImplementedError(f"Engine '{engine}' not recognized.")
+        if pareto:
+            self.pareto_off_coverage(moves - set_moves, baseline, STAB)
 
         self.set_moves_by_type(baseline, STAB)
         return self.max_coverage
 
+    def get_power_coverage(self, moves=2, given=[], STAB=True, engine="bound", top_k=None, store=None):
+        """get_off_coverage(weighting="power"), with the moves of 'store' if given."""
+        if engine != "bound":
+            raise NotImplementedError(f"Engine '{engine}' not supported with power weighting.")
+        store = store or Moves.default_store()
+        best = store.best_moves(self.generation)
+        powers = store.best_powers(self.generation)
+
+        self.coverage_dict = {1: {}, 2: {}, 3: {}, 4: {}}
+        self.inv_coverage_dict = {1: {}, 2: {}, 3: {}, 4: {}}
+        self.top_coverage = {}
+        self.pareto_coverage = {}
+        self.max_coverage = {}
+        if given:
+            rows = Coverage.coverage_rows(self.typing_str, self.gen, STAB) * powers[:, None]
+            rows_given = [best[Matcher.type_index[element]] for element in given]
+            self.max_coverage[0] = ([store.names(row) if row >= 0 else f"generic {element} move"
+                                     for element, row in zip(given, rows_given)],
+                                    Coverage.number(Coverage.coverage_base(rows, given).sum() / 100))
+
+        def key(combination):
+            names = store.names(best[list(combination)])
+            return names[0] if len(names) == 1 else tuple(sorted(names))
+
+        self.search_off_coverage(moves - len(given), given, STAB, top_k, engine, powers, key)
+        self.set_moves_by_type(given, STAB, store=store)
+        return self.max_coverage
+
+    def lookup_off_coverage(self, moves=2, given=[], STAB=True, table=None):
+        """Same as get_off_coverage, answered from a precomputed Coverage table if it covers the query.
+
+        The table (Coverage.load_table() by default) only holds searches without given moves;
+        everything else, and a missing or stale table, falls back to get_off_coverage.
+        """
+        table = table or Coverage.load_table()
+        sizes = self.coverage_sizes(moves)
+        answers = [table.get(self.typing_str, self.gen, STAB, size) for size in sizes] if table else [None]
+        if given or not sizes or None in answers:
+            return self.get_off_coverage(moves, given, STAB)
+
+        self.coverage_dict = {1: {}, 2: {}, 3: {}, 4: {}}
+        self.inv_coverage_dict = {1: {}, 2: {}, 3: {}, 4: {}}
+        self.top_coverage = {}
+        self.pareto_coverage = {}
+        self.max_coverage = {size: ([self.coverage_key(c) for c in best], Coverage.number(score))
+                             for size, (best, score) in zip(sizes, answers)}
+        self.set_moves_by_type(given, STAB)
+        return self.max_coverage
+
+    @staticmethod
+    def coverage_sizes(new_moves):
+        """Returns the numbers of added move types get_off_coverage reports for 'new_moves' new moves."""
+        if new_moves <= 1:
+            return [1]
+        if new_moves <= 4:
+            return list(range(1, new_moves + 1))
+        return []
+
+    @staticmethod
+    def coverage_key(combination):
+        """Returns how get_off_coverage reports a combination of type indices."""
+        if len(combination) == 1:
+            return types[combination[0]]
+        return tuple(sorted(types[k] for k in combination))
+
+    def search_off_coverage(self, new_moves, baseline, STAB=True, top_k=None, engine="bound", powers=None, key=None):
+        """Fills self.max_coverage (and self.top_coverage) using one of Coverage.engines.
+
+        powers weights the rows of the types by the power of their moves (see get_power_coverage),
+        the scores are then reported per 100 power; key reports the combinations of type
+        indices, coverage_key by default.
+        """
+        search = Coverage.engines[engine]
+        key = key or self.coverage_key
+        n = gen_types[self.gen]
+        rows = Coverage.coverage_rows(self.typing_str, self.gen, STAB)
+        if powers is not None:
+            rows = rows * powers[:, None]
+            candidates = np.flatnonzero(powers[:n] > 0)
+            unit = 100
+        else:
+            candidates = np.arange(n)
+            unit = 1
+        base = Coverage.coverage_base(rows, baseline)
+
+        for size in self.coverage_sizes(new_moves):
+            best, score, ranking = search(rows[candidates], base, size, top_k)
+            self.max_coverage[size] = ([key(candidates[list(c)].tolist()) for c in best], Coverage.number(score / unit))
+            if top_k:
+                self.top_coverage[size] = [(key(candidates[list(c)].tolist()), Coverage.number(value / unit))
+                                           for value, c in ranking]
+
+    def exhaustive_off_coverage(self, new_moves, baseline, STAB=True, top_k=None):
+        """Fills self.max_coverage, self.coverage_dict and self.inv_coverage_dict (and self.top_coverage) by scoring every addition.
+
+        The additions come from _additions and are scored by off_scorer, so no Attack or
+        table is built per addition; ties of the top_k are ranked in that order.
+        """
+        scorer = self.off_scorer(baseline, STAB)
+        rankings = {size: Coverage.Ranking(top_k) for size in self.coverage_sizes(new_moves)}
+        for combination in _additions(gen_types[self.gen], new_moves):
+            key = len(combination)
+            added = self.coverage_key(combination)
+            value = Coverage.number(scorer.score(combination))
+            self.coverage_dict[key][added] = value
+            if value in self.inv_coverage_dict[key]:
+                self.inv_coverage_dict[key][value].append(added)
+            else:
+                self.inv_coverage_dict[key][value] = [added]
+            if top_k:
+                rankings[key].record(value, added)
+
+        for key in self.coverage_sizes(new_moves):
+            max_key = max(self.inv_coverage_dict[key].keys())
+            self.max_coverage[key] = (self.inv_coverage_dict[key][max_key], max_key)
+            if top_k:
+                self.top_coverage[key] = [(added, value) for value, added in rankings[key].result()[2]]
+
+    def pareto_off_coverage(self, new_moves, baseline, STAB=True):
+        """Fills self.pareto_coverage using Coverage.pareto_search, see get_off_coverage."""
+        rows = Coverage.coverage_rows(self.typing_str, self.gen, STAB)[:gen_types[self.gen]]
+        base = Coverage.coverage_base(rows, baseline)
+        for size in self.coverage_sizes(new_moves):
+            self.pareto_coverage[size] = [(self.coverage_key(combination), (Coverage.number(score), -unsusceptibles, advantages))
+                                          for (score, unsusceptibles, advantages), combination
+                                          in Coverage.pareto_search(rows, base, size)]
+
+    def iter_off_coverage(self, moves=2, given=[], STAB=True, order="combinations", min_score=None,
+                          required=[], excluded=[]):
+        """Yields (addition, score, off_vector) for the move types get_off_coverage could add to the given ones.
+
+        Nothing is computed before the first item is requested and no dict is built: the
+        additions of every size of coverage_sizes are scored one at a time by off_scorer and
+        reported as in coverage_dict, off_vector being a copy of the multipliers dealt to
+        every target. order="combinations" yields them by size, in the order of
+        itertools.combinations of the types; order="score" by decreasing score (ties in
+        combinations order), which scores every addition before yielding the first one but
+        only builds the off_vector of what is yielded. Additions scoring less than min_score,
+        missing a type of 'required' or holding a type of 'excluded' are skipped during the
+        enumeration.
+        """
+        n = gen_types[self.gen]
+        for element in list(required) + list(excluded):
+            if element not in types[:n]:
+                raise NotImplementedError(f"Type '{element}' not recognized in generation {self.gen}.")
+        if order not in ["combinations", "score"]:
+            raise NotImplementedError(f"Order '{order}' not recognized.")
+
+        if set(required) & set(excluded):
+            return
+
+        scorer = self.off_scorer(given, STAB)
+        fixed = tuple(sorted({Matcher.type_index[element] for element in required}))
+        skipped = set(fixed) | {Matcher.type_index[element] for element in excluded}
+        candidates = [k for k in range(n) if k not in skipped]
+
+        def scored():
+            for size in self.coverage_sizes(moves - len(given)):
+                if size < len(fixed):
+                    continue
+                for rest in combinations(candidates, size - len(fixed)):
+                    combination = tuple(sorted(fixed + rest))
+                    score = scorer.score(combination)
+                    if min_score is None or score >= min_score:
+                        yield combination, score
+
+        if order == "combinations":
+            for combination, score in scored():
+                yield self.coverage_key(combination), Coverage.number(score), scorer.buffer.copy()
+            return
+
+        heap = [(-score, k, combination) for k, (combination, score) in enumerate(scored())]
+        heapify(heap)
+        while heap:
+            score, _, combination = heappop(heap)
+            yield self.coverage_key(combination), Coverage.number(-score), scorer.vector(combination).copy()
+
+    @staticmethod
+    def coverage_for_all_typings(generation=6, moves=4, given=[], STAB=True, workers=None, engine="bound"):
+        """Runs get_off_coverage for every typing of typings(generation) and returns {typing: max_coverage}.
+
+        The typings are split into chunks which are spread over a ProcessPoolExecutor with
+        'workers' processes (os.cpu_count() by default, workers=1 runs in this process).
+        The matchups of the generation are loaded before the pool starts, so forked workers
+        inherit them and spawned ones read the compiled cache instead of parsing the files.
+        The result is ordered like typings(generation) whatever the order the chunks finish in.
+        """
+        gen = normalize_gen(generation)
+        every_typing = typings(gen)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            return {typing: coverage for typing, coverage in
+                    zip(every_typing, _coverage_chunk(every_typing, gen, moves, given, STAB, engine))}
+
+        Matcher.preload(gen)
+        size = -(-len(every_typing) // (4*workers))
+        chunks = [every_typing[k:k + size] for k in range(0, len(every_typing), size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=Matcher.preload, initargs=(gen,)) as pool:
+            results = pool.map(_coverage_chunk, chunks, repeat(gen), repeat(moves), repeat(given),
+                               repeat(STAB), repeat(engine))
+            coverages = [coverage for chunk in results for coverage in chunk]
+        return dict(zip(every_typing, coverages))
+
+    @staticmethod
+    def batch_def_profiles(generation=6):
+        """Computes the defensive profiles of all typings of a generation at once.
+
+        Returns a dict of columns whose rows follow typings(generation): "Types" holds the
+        typings, "Defensive Table" a (typings x types) array of the multipliers taken and
+        every label of def_columns an array of what the corresponding Pokemon would report,
+        e.g. "Double Weaknesses" is len(Pokemon(None, typing, generation).d_weak).
+        """
+        gen = normalize_gen(generation)
+        n = gen_types[gen]
+        taken = Matcher.effectiveness(gen)[:n, :n].T
+        first, second = np.triu_indices(n, k=1)
+        def_table = np.concatenate([taken, taken[first]*taken[second]])
+
+        return {"Types": typings(gen),
+                "Defensive Table": def_table,
+                "Defensive Score": (def_table - 1).sum(axis=1),
+                "Defensive Attribute": np.zeros(len(def_table), dtype=int),
+                "Double Weaknesses": (def_table == 4).sum(axis=1),
+                "Weaknesses": (def_table == 2).sum(axis=1),
+                "Defensive Neutralities": (def_table == 1).sum(axis=1),
+                "Resistances": (def_table == 0.5).sum(axis=1),
+                "Double Resistances": (def_table == 0.25).sum(axis=1),
+                "Immunities": (def_table == 0).sum(axis=1)}
 
     def set_def_attr(self, d_w, w, n, r, d_r, i):
-        self.def_attr =  sum([d_w for d_weak in self.d_weak])
-        self.def_attr += sum([w for weak in self.weaknesses])
-        self.def_attr += sum([n for neu in self.def_neutral])
-        self.def_attr -= sum([r for res in self.resistances])
-        self.def_attr -= sum([d_r for d_rest in self.d_rest])
-        self.def_attr -= sum([i for immu in self.immunities])
+        def_inv_table = self.def_inv_table
+        self.def_attr =  sum([d_w for d_weak in def_inv_table[4]])
+        self.def_attr += sum([w for weak in def_inv_table[2]])
+        self.def_attr += sum([n for neu in def_inv_table[1]])
+        self.def_attr -= sum([r for res in def_inv_table[0.5]])
+        self.def_attr -= sum([d_r for d_rest in def_inv_table[0.25]])
+        self.def_attr -= sum([i for immu in def_inv_table[0]])
         return self.def_attr
 
     def __str__(self):
@@ -300,6 +652,169 @@ class PokéTest(TestCase):
         actual = Pokemon(None, ["Fire", "Fire"], 6).d_rest
         self.assertEqual(actual, expected)
 
+    """Batch evaluation has to agree with evaluating every typing on its own"""
+    def test_batch_def_profiles_gen2(self):
+        profiles = Pokemon.batch_def_profiles(2)
+        for row, typing in enumerate(profiles["Types"]):
+            monster = Pokemon(None, typing, 2)
+            expected = [monster.def_score, len(monster.d_weak), len(monster.immunities)]
+            actual = [profiles["Defensive Score"][row], profiles["Double Weaknesses"][row], profiles["Immunities"][row]]
+            self.assertEqual(actual, expected)
+
+    """The coverage engines have to agree with each other"""
+    def test_Rock_Dark_coverage_engines(self):
+        monster = Pokemon("Tyranitar", ["Rock", "Dark"], 6)
+        expected = monster.get_off_coverage(moves=4, given=["Rock"], engine="exhaustive")
+        actual = monster.get_off_coverage(moves=4, given=["Rock"], engine="bound")
+        self.assertEqual(actual, expected)
+        actual = monster.get_off_coverage(moves=4, given=["Rock"], engine="bitset")
+        self.assertEqual(actual, expected)
+
+    def test_Water_top_coverage(self):
+        monster = Pokemon(None, ["Water"], 6)
+        monster.get_off_coverage(moves=2, top_k=3)
+        expected = monster.max_coverage[2]
+        actual = ([monster.top_coverage[2][0][0]], monster.top_coverage[2][0][1])
+        self.assertEqual(actual, expected)
+
+    def test_coverage_for_all_typings_gen1(self):
+        expected = Pokemon.coverage_for_all_typings(1, moves=2, workers=1)
+        actual = Pokemon.coverage_for_all_typings(1, moves=2, workers=2)
+        self.assertEqual(list(actual.items()), list(expected.items()))
+
+    def test_Ice_lookup_off_coverage_fallback(self):
+        monster = Pokemon(None, ["Ice"], 2)
+        expected = monster.get_off_coverage(moves=3, given=["Ice"])
+        actual = monster.lookup_off_coverage(moves=3, given=["Ice"])
+        self.assertEqual(actual, expected)
+
+    """Answers from a precomputed table have to agree with a live search"""
+    def test_lookup_off_coverage_table_gen1(self):
+        with TemporaryDirectory() as directory:
+            Coverage.precompute_table(directory, generations=[1])
+            table = Coverage.load_table(directory)
+            for typing in typings(1):
+                monster = Pokemon(None, typing, 1)
+                self.assertIsNotNone(table.get(typing, 1, True, 4))
+                expected = monster.get_off_coverage(moves=4)
+                actual = monster.lookup_off_coverage(moves=4, table=table)
+                self.assertEqual(actual, expected)
+            del Coverage._tables[directory], table
+
+    """Memoized tables have to follow the changes of typing and moves"""
+    def test_Ground_set_typing_Flying(self):
+        monster = Pokemon(None, ["Ground"], 6)
+        monster.get_def_matchups()
+        monster.set_typing(["Flying"])
+        monster.get_def_matchups()
+        expected = Pokemon(None, ["Flying"], 6).def_table
+        actual = monster.def_table
+        self.assertEqual(actual, expected)
+
+    def test_Fire_reset_moves(self):
+        monster = Pokemon(None, ["Fire"], 6)
+        monster.set_moves_by_type(["Fire"])
+        monster.reset_moves()
+        expected = 0
+        actual = monster.get_off_matchups()
+        self.assertEqual(actual, expected)
+
+    def test_Water_Ground_typing_row(self):
+        expected = ("Water", "Ground")
+        actual = typings(6)[typing_row(["Ground", "Water", None], 6)]
+        self.assertEqual(actual, expected)
+
+    def test_Magnemite_gen1_from_species(self):
+        expected = ["Electric"]
+        actual = Pokemon.from_species("Magnemite", 1).typing_str
+        self.assertEqual(actual, expected)
+
+    def test_Fire_gen4_power_moves(self):
+        monster = Pokemon(None, ["Fire"], 4)
+        monster.get_off_coverage(2, given=["Fire"], weighting="power")
+        expected = [["Flare Blitz"], "Flare Blitz"]
+        actual = [monster.max_coverage[0][0], monster.moves[0].name]
+        self.assertEqual(actual, expected)
+
+    def test_Water_gen1_power_coverage(self):
+        expected = {1: (["Hydro Pump"], 27.225), 2: ([("Blizzard", "Hydro Pump")], 30.525)}
+        actual = Pokemon(None, ["Water"], 1).get_off_coverage(2, weighting="power")
+        self.assertEqual(actual, expected)
+
+    def test_Fire_Flying_off_scorer(self):
+        monster = Pokemon(None, ["Fire", "Flying"], 6)
+        scorer = monster.off_scorer(["Fire"])
+        expected = [monster.set_moves_by_type(["Fire"] + typing) for typing in [[], ["Ground"], ["Ice", "Rock"]]]
+        actual = [scorer.score([Matcher.type_index[element] for element in typing]) for typing in [[], ["Ground"], ["Ice", "Rock"]]]
+        self.assertEqual(actual, expected)
+
+    def test_Fire_Flying_exhaustive_top_coverage(self):
+        monster = Pokemon(None, ["Fire", "Flying"], 6)
+        monster.get_off_coverage(moves=3, engine="bound", top_k=5)
+        expected = [[score for _, score in monster.top_coverage[size]] for size in [1, 2, 3]]
+        monster.get_off_coverage(moves=3, engine="exhaustive", top_k=5)
+        actual = [[score for _, score in monster.top_coverage[size]] for size in [1, 2, 3]]
+        self.assertEqual(actual, expected)
+
+    def test_Fire_Flying_pareto_coverage(self):
+        monster = Pokemon(None, ["Fire", "Flying"], 6)
+        monster.get_off_coverage(moves=4, given=["Fire"], pareto=True)
+        expected = [(("Flying", "Ground", "Ice"), (38, 0, 12)), (("Fairy", "Grass", "Ground"), (37.5, 0, 13)),
+                    (("Electric", "Fairy", "Ground"), (37.5, 0, 13))]
+        actual = monster.pareto_coverage[3]
+        self.assertEqual(actual, expected)
+
+    """The stream has to agree with the exhaustive engine"""
+    def test_Fire_Flying_iter_off_coverage(self):
+        monster = Pokemon(None, ["Fire", "Flying"], 6)
+        monster.get_off_coverage(moves=3, given=["Fire"], engine="exhaustive")
+        expected = {addition: score for size in [1, 2] for addition, score in monster.coverage_dict[size].items()}
+        actual = {addition: score for addition, score, _ in monster.iter_off_coverage(3, ["Fire"])}
+        self.assertEqual(actual, expected)
+
+    def test_Water_iter_off_coverage_filters(self):
+        monster = Pokemon(None, ["Water"], 2)
+        expected = [(addition, score) for addition, score, _ in monster.iter_off_coverage(3, order="score")
+                    if score >= 22 and "Ice" in addition and "Ground" not in addition]
+        actual = [(addition, score) for addition, score, _ in
+                  monster.iter_off_coverage(3, order="score", min_score=22, required=["Ice"], excluded=["Ground"])]
+        self.assertEqual(actual, expected)
+
+    def test_Fire_gen6_def_matchups_gen1(self):
+        monster = Pokemon(None, ["Fire"], 6)
+        monster.get_def_matchups(1)
+        expected = [15, ["Water", "Ground", "Rock"], 15]
+        actual = [len(monster.def_table), monster.weaknesses, sum(map(len, monster.def_inv_table.values()))]
+        self.assertEqual(actual, expected)
+        monster = Pokemon(None, ["Fire"], 1)
+        monster.get_def_matchups(6)
+        expected = ["Grass", "Fire", "Bug", "Ice", "Steel", "Fairy"]
+        actual = monster.resistances
+        self.assertEqual(actual, expected)
+
+    def test_Fire_gen1_moves_gen6(self):
+        monster = Pokemon(None, ["Fire"], 1)
+        expected = [15, ["Grass", "Fire", "Flying", "Ground", "Rock", "Dragon"], ["Water", "Ice"]]
+        monster.set_moves_by_type(["Water", "Ice"], generation=6)
+        actual = [len(monster.off_table), monster.advantages, [attack.type for attack in monster.moves]]
+        self.assertEqual(actual, expected)
+        with self.assertRaises(NotImplementedError):
+            monster.set_moves_by_type(["Water", "Fairy"], generation=6)
+
+    """Pokemon of the same typing share their vectors, the tables are derived from them"""
+    def test_Fire_Flying_shared_vectors(self):
+        monster, other = Pokemon(None, ["Fire", "Flying"], 6), Pokemon("Charizard", ["Flying", "Fire"], 6)
+        expected = [True, False, ["Rock"], {4: ["Rock"], 0: ["Ground"]}]
+        actual = [monster.def_vector is other.def_vector, hasattr(monster, "__dict__"), monster.d_weak,
+                  {key: value for key, value in monster.def_inv_table.items() if key in [4, 0]}]
+        self.assertEqual(actual, expected)
+
+
+"""Profiling enables itself when imported with POKEMON_PROFILE set. If Profiling is already
+being imported it imports this module, and will enable itself once it is initialized."""
+if os.environ.get("POKEMON_PROFILE") and "Profiling" not in sys.modules:
+    import Profiling
+
 
 if __name__ == "__main__":
     main()
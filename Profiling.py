@@ -0,0 +1,230 @@
+import atexit
+import json
+import os
+import random
+import subprocess
+import sys
+from contextlib import contextmanager
+from functools import wraps
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from unittest import TestCase, main
+
+import numpy as np
+
+import Matcher
+from Attacks import Attack
+from Pokemon import Pokemon
+from Types import Type
+
+"""
+Opt-in instrumentation of the hot paths. Nothing is wrapped until enable() is called, so
+there is no overhead at all when profiling is off. enable() replaces the functions of
+`timed` by wrappers recording their calls and latencies, and the constructors of
+`counted` by wrappers counting the objects built, which are attributed to every timed
+call running at that moment. disable() restores the original functions.
+Setting the environment variable POKEMON_PROFILE before Pokemon or Profiling is
+imported enables it for the whole process and writes the report at exit: to the file
+POKEMON_PROFILE names if it ends in .json, else as text to stderr.
+"""
+
+"""(owner, attribute, name) of the functions whose latencies are recorded."""
+timed = [(Matcher, "load_generation", "Matcher.load_generation"),
+         (Matcher, "compile_matchups", "Matcher.compile_matchups"),
+         (Type, "_build", "Type construction"),
+         (Pokemon, "get_def_matchups", "Pokemon.get_def_matchups"),
+         (Pokemon, "get_off_matchups", "Pokemon.get_off_matchups"),
+         (Pokemon, "get_off_coverage", "Pokemon.get_off_coverage"),
+         (Pokemon, "search_off_coverage", "Pokemon.search_off_coverage"),
+         (Pokemon, "exhaustive_off_coverage", "Pokemon.exhaustive_off_coverage"),
+         (Pokemon, "lookup_off_coverage", "Pokemon.lookup_off_coverage")]
+
+"""(owner, attribute, kind) of the constructors whose objects are counted."""
+counted = [(Type, "_build", "Type"), (Attack, "__init__", "Attack"), (Pokemon, "__init__", "Pokemon")]
+
+
+class Profiler:
+    """Collects the calls, latencies and constructed objects of the instrumented functions.
+
+    Call counts and cumulative times are exact; the percentiles are computed from a
+    reservoir sample of at most 'reservoir' latencies per function, so memory stays
+    bounded in long running processes.
+    """
+    def __init__(self, reservoir=4096):
+        self.reservoir = reservoir
+        self.random = random.Random(0)
+        self.stack = []
+        self.calls = {}
+        self.total = {}
+        self.samples = {}
+        self.objects = {}
+        self.constructed = {}
+
+    def add(self, name, elapsed):
+        calls = self.calls[name] = self.calls.get(name, 0) + 1
+        self.total[name] = self.total.get(name, 0) + elapsed
+        samples = self.samples.setdefault(name, [])
+        if len(samples) < self.reservoir:
+            samples.append(elapsed)
+        else:
+            k = self.random.randrange(calls)
+            if k < self.reservoir:
+                samples[k] = elapsed
+
+    def count(self, kind):
+        self.constructed[kind] = self.constructed.get(kind, 0) + 1
+        for name in set(self.stack):
+            objects = self.objects.setdefault(name, {})
+            objects[kind] = objects.get(kind, 0) + 1
+
+    def report(self):
+        """Returns {"functions": {name: stats}, "objects": {kind: count}}, times in milliseconds.
+
+        The stats of a function are its "calls", "total_ms", "p50_ms", "p99_ms" and the
+        "objects" constructed during its calls, nested calls included, per kind.
+        """
+        functions = {}
+        for name in sorted(self.calls, key=self.total.get, reverse=True):
+            samples = np.array(self.samples[name]) * 1000
+            functions[name] = {"calls": self.calls[name], "total_ms": self.total[name] * 1000,
+                               "p50_ms": float(np.percentile(samples, 50)),
+                               "p99_ms": float(np.percentile(samples, 99)),
+                               "objects": dict(self.objects.get(name, {}))}
+        return {"functions": functions, "objects": dict(self.constructed)}
+
+    def text_report(self):
+        report = self.report()
+        lines = [f"{'function':34}{'calls':>9}{'total ms':>12}{'p50 ms':>10}{'p99 ms':>10}  objects"]
+        for name, stats in report["functions"].items():
+            objects = ", ".join(f"{kind} {count}" for kind, count in stats["objects"].items())
+            lines.append(f"{name:34}{stats['calls']:9}{stats['total_ms']:12.3f}{stats['p50_ms']:10.4f}"
+                         f"{stats['p99_ms']:10.4f}  {objects}")
+        lines.append("objects constructed: " + ", ".join(f"{kind} {count}" for kind, count in report["objects"].items()))
+        return "\n".join(lines)
+
+    def dump(self, file):
+        with open(file, "w") as output:
+            json.dump(self.report(), output, indent=1)
+
+
+def _timing(profiler, name, function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        profiler.stack.append(name)
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            profiler.stack.pop()
+            profiler.add(name, elapsed)
+    return wrapper
+
+def _counting(profiler, kind, function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        profiler.count(kind)
+        return function(*args, **kwargs)
+    return wrapper
+
+
+_originals = []
+active = None
+
+def enable(profiler=None):
+    """Instruments the functions of `timed` and `counted`, returns the Profiler collecting the results."""
+    global active
+    if active is not None:
+        return active
+    active = profiler or Profiler()
+    for owner, attribute, name in timed:
+        _originals.append((owner, attribute, owner.__dict__[attribute]))
+        setattr(owner, attribute, _timing(active, name, getattr(owner, attribute)))
+    for owner, attribute, kind in counted:
+        if not any(owner is patched and attribute == name for patched, name, _ in _originals):
+            _originals.append((owner, attribute, owner.__dict__[attribute]))
+        setattr(owner, attribute, _counting(active, kind, getattr(owner, attribute)))
+    return active
+
+def disable():
+    """Restores the original functions, returns the Profiler of the results (None if profiling was off)."""
+    global active
+    profiler, active = active, None
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+    return profiler
+
+@contextmanager
+def profiling(profiler=None):
+    """Profiles the body of the with statement: `with profiling() as profiler: ...`."""
+    was_active = active is not None
+    profiler = enable(profiler)
+    try:
+        yield profiler
+    finally:
+        if not was_active:
+            disable()
+
+
+def _report_at_exit(target):
+    profiler = disable()
+    if profiler is None:
+        return
+    if target.endswith(".json"):
+        profiler.dump(target)
+    else:
+        print(profiler.text_report(), file=sys.stderr)
+
+def enable_from_environment():
+    """Enables profiling for the whole process if POKEMON_PROFILE is set, see above."""
+    target = os.environ.get("POKEMON_PROFILE")
+    if target and active is None:
+        enable()
+        atexit.register(_report_at_exit, target)
+
+enable_from_environment()
+
+
+class ProfilingTest(TestCase):
+    def test_counts_and_restores(self):
+        original = Pokemon.get_off_matchups
+        with profiling() as profiler:
+            monster = Pokemon(None, ["Fire"], 6)
+            monster.set_moves_by_type(["Water", "Grass"])
+        report = profiler.report()
+        self.assertEqual(report["functions"]["Pokemon.get_off_matchups"]["calls"], 2)
+        self.assertEqual(report["objects"]["Attack"], 2)
+        self.assertEqual(report["objects"]["Pokemon"], 1)
+        self.assertIs(Pokemon.get_off_matchups, original)
+
+    def test_objects_per_operation(self):
+        """The exhaustive engine scores its additions without building an Attack per addition."""
+        with profiling() as profiler:
+            Pokemon(None, ["Fire"], 1).get_off_coverage(1, engine="exhaustive")
+        expected = {}
+        actual = profiler.report()["functions"]["Pokemon.get_off_coverage"]["objects"]
+        self.assertEqual(actual, expected)
+
+    def test_environment_switch(self):
+        """Both import orders have to work, importing Profiling first used to be circular."""
+        for imports in ["import Profiling; from Pokemon import Pokemon", "from Pokemon import Pokemon"]:
+            with TemporaryDirectory() as directory:
+                file = path.join(directory, "profile.json")
+                code = f"{imports}; Pokemon(None, ['Fire'], 6).get_off_coverage(2)"
+                subprocess.run([sys.executable, "-c", code], cwd=path.dirname(path.abspath(__file__)), check=True,
+                               env={**os.environ, "POKEMON_PROFILE": file})
+                with open(file) as report:
+                    self.assertEqual(json.load(report)["functions"]["Pokemon.get_off_coverage"]["calls"], 1)
+
+    def test_reservoir_bounded(self):
+        profiler = Profiler(reservoir=10)
+        for k in range(1000):
+            profiler.add("f", k)
+        self.assertEqual(len(profiler.samples["f"]), 10)
+        self.assertEqual(profiler.calls["f"], 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import sys
+from functools import lru_cache
+from os import path
+from unittest import TestCase, main
+
+import numpy as np
+
+from Types import normalize_gen
+
+types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
+         "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
+gen_types = {1: 15, 2: 17, 6: 18}
+type_index = {name: k for k, name in enumerate(types)}
+
+species_file = path.join(path.dirname(path.abspath(__file__)), "species", "species.txt")
+stat_columns = ["HP", "Attack", "Defense", "Sp. Atk", "Sp. Def", "Speed"]
+
+"""
+The species file is tab separated with a header line and one species per line:
+Name, Type 1, Type 2 ("None" for single typed species), the six base stats in the order
+of stat_columns and the generation the species was introduced in. Typings are the ones
+of the latest generation, see SpeciesStore.typing for older generations.
+"""
+
+
+class SpeciesStore:
+    """Column-oriented, read-only store of the species, one NumPy array per column.
+
+    "name" is a unicode array, "type1" and "type2" hold indices into `types` (-1 for no
+    second type), the base stats are uint16 columns named as in stat_columns and
+    "generation" is a uint8 column. Rows are in file order. A sorted permutation of the
+    names and a CSR index of the rows of every type make lookups and filters vectorized.
+    """
+    def __init__(self, columns):
+        self.columns = columns
+        for column in columns.values():
+            column.flags.writeable = False
+        self.name_order = np.argsort(columns["name"], kind="stable")
+
+        """type_rows[type_offsets[t]:type_offsets[t + 1]] are the rows having the type t."""
+        pairs = np.concatenate([np.stack([columns["type1"], np.arange(len(self))]),
+                                np.stack([columns["type2"], np.arange(len(self))])], axis=1)
+        pairs = pairs[:, pairs[0] >= 0]
+        pairs = pairs[:, np.lexsort((pairs[1], pairs[0]))]
+        self.type_offsets = np.searchsorted(pairs[0], np.arange(len(types) + 1)).astype(np.int32)
+        self.type_rows = pairs[1].astype(np.int32)
+
+    def __len__(self):
+        return len(self.columns["name"])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def nbytes(self):
+        """Returns {column: bytes} of the columns and indexes."""
+        sizes = {column: array.nbytes for column, array in self.columns.items()}
+        sizes["name index"] = self.name_order.nbytes
+        sizes["type index"] = self.type_offsets.nbytes + self.type_rows.nbytes
+        return sizes
+
+    def row(self, name):
+        """Returns the row of a species, raising NotImplementedError for unknown names."""
+        names = self.columns["name"]
+        k = int(np.searchsorted(names, name, sorter=self.name_order))
+        if k == len(names) or names[self.name_order[k]] != name:
+            raise NotImplementedError(f"Species {name} not recognized.")
+        return int(self.name_order[k])
+
+    def rows_with_type(self, element):
+        """Returns the sorted rows of the species having the type 'element'."""
+        if element not in type_index:
+            raise NotImplementedError(f"Type {element} not recognized.")
+        t = type_index[element]
+        return self.type_rows[self.type_offsets[t]:self.type_offsets[t + 1]]
+
+    def select(self, typing=None, generation=None, min_stats=None, max_stats=None):
+        """Returns the rows of the species matching all the filters, in file order.
+
+        typing lists types the species must all have, generation keeps the species
+        introduced up to that generation and min_stats/max_stats map stat columns (or
+        "Total") to inclusive bounds, e.g. select(["Fire"], min_stats={"Speed": 100}).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for element in typing or []:
+            has_type = np.zeros(len(self), dtype=bool)
+            has_type[self.rows_with_type(element)] = True
+            mask &= has_type
+        if generation is not None:
+            mask &= self.columns["generation"] <= generation
+        for stat, bound in (min_stats or {}).items():
+            mask &= self.stat(stat) >= bound
+        for stat, bound in (max_stats or {}).items():
+            mask &= self.stat(stat) <= bound
+        return np.flatnonzero(mask)
+
+    def stat(self, stat):
+        """Returns a stat column, "Total" being the sum of the base stats."""
+        if stat == "Total":
+            return sum(self.columns[column].astype(np.int32) for column in stat_columns)
+        if stat not in stat_columns:
+            raise NotImplementedError(f"Stat {stat} not recognized.")
+        return self.columns[stat]
+
+    def names(self, rows):
+        return self.columns["name"][rows].tolist()
+
+    def typing(self, species, generation=6):
+        """Returns the type names of a species (name or row) in a generation.
+
+        Types which do not exist in the generation are dropped, a species left without a
+        type is Normal: this gives the typings before Steel, Dark and Fairy were added,
+        e.g. Magnemite is Electric and Clefairy Normal in generation 1.
+        """
+        gen = normalize_gen(generation)
+        row = self.row(species) if isinstance(species, str) else species
+        typing = [types[t] for t in (self.columns["type1"][row], self.columns["type2"][row])
+                  if 0 <= t < gen_types[gen]]
+        return typing or ["Normal"]
+
+    def type_ids(self, generation=6):
+        """Returns the (species x 2) int8 array of the type indices of SpeciesStore.typing, -1 for no type."""
+        n = gen_types[normalize_gen(generation)]
+        ids = np.stack([self.columns["type1"], self.columns["type2"]], axis=1)
+        ids = np.where(ids < n, ids, -1)
+        ids[(ids < 0).all(axis=1), 0] = type_index["Normal"]
+        return ids
+
+
+def _type_id(cell, line):
+    if cell == "None":
+        return -1
+    if cell not in type_index:
+        raise ValueError(f"Unknown type {cell!r} in the species file: {line!r}")
+    return type_index[cell]
+
+def load_species(file=None):
+    """Reads the species file (species/species.txt by default) into a SpeciesStore."""
+    with open(file or species_file, encoding="utf-8") as source:
+        lines = [line for line in source.read().splitlines()[1:] if line.strip()]
+
+    names, type1, type2, stats, generation = [], [], [], [], []
+    for line in lines:
+        cells = [cell.strip() for cell in line.split("\t")]
+        if len(cells) != 4 + len(stat_columns):
+            raise ValueError(f"Malformed line in the species file: {line!r}")
+        names.append(cells[0])
+        type1.append(_type_id(cells[1], line))
+        type2.append(_type_id(cells[2], line))
+        stats.append([int(cell) for cell in cells[3:-1]])
+        generation.append(int(cells[-1]))
+
+    stats = np.array(stats, dtype=np.uint16).reshape(-1, len(stat_columns))
+    columns = {"name": np.array(names, dtype=str), "type1": np.array(type1, dtype=np.int8),
+               "type2": np.array(type2, dtype=np.int8)}
+    columns.update({column: np.ascontiguousarray(stats[:, k]) for k, column in enumerate(stat_columns)})
+    columns["generation"] = np.array(generation, dtype=np.uint8)
+    return SpeciesStore(columns)
+
+@lru_cache(maxsize=None)
+def default_store():
+    """Returns the SpeciesStore of species/species.txt, loaded once."""
+    return load_species()
+
+
+class SpeciesTest(TestCase):
+    store = default_store()
+
+    def test_Charizard_row(self):
+        expected = ["Charizard", "Fire", "Flying", 100]
+        row = self.store.row("Charizard")
+        actual = [self.store["name"][row]] + self.store.typing(row) + [int(self.store["Speed"][row])]
+        self.assertEqual(actual, expected)
+
+    def test_select_Steel_gen2(self):
+        expected = ["Magnemite", "Scizor"]
+        actual = self.store.names(self.store.select(["Steel"], generation=2))
+        self.assertEqual(actual, expected)
+
+    def test_select_stats(self):
+        expected = ["Dragonite", "Tyranitar"]
+        actual = self.store.names(self.store.select(min_stats={"Total": 600}, max_stats={"Speed": 90}))
+        self.assertEqual(actual, expected)
+
+    def test_Clefairy_gen1(self):
+        expected = ["Normal"]
+        actual = self.store.typing("Clefairy", 1)
+        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    if "--summary" in sys.argv[1:]:
+        store = default_store()
+        print(f"{len(store)} species, bytes per column: {store.nbytes()}")
+    else:
+        main()
@@ -0,0 +1,214 @@
+from itertools import combinations_with_replacement
+from unittest import TestCase, main
+
+import numpy as np
+
+import Matcher
+from Coverage import Ranking, number
+from Optimizers import Budget, optimizers
+from Pokemon import Pokemon
+from Types import normalize_gen, typings
+
+types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
+         "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
+gen_types = {1: 15, 2: 17, 6: 18}
+team_size = 6
+
+"""The most open slots complete searches exhaustively, optimize searches larger completions."""
+complete_slots = 2
+
+"""The objective is off_score - def_score - stacked weaknesses, each scaled by its weight."""
+default_weights = {"off": 1, "def": 1, "stacked": 1}
+
+
+def candidate_tables(generation=6, STAB=True):
+    """Returns (typings, def_tables, off_tables) of every typing of a generation as arrays.
+
+    A candidate is assumed to attack with moves of its own types, so its offensive table is
+    the maximum of the rows of its types in the effectiveness matrix (times 1.5 for STAB).
+    """
+    gen = normalize_gen(generation)
+    n = gen_types[gen]
+    rows = Matcher.effectiveness(gen)[:n, :n] * (1.5 if STAB else 1)
+    first, second = np.triu_indices(n, k=1)
+    off_tables = np.concatenate([rows, np.maximum(rows[first], rows[second])])
+    return typings(gen), Pokemon.batch_def_profiles(gen)["Defensive Table"], off_tables
+
+def team_metrics(def_tables, off_tables):
+    """Combines the tables of the members (second to last axis) into the metrics of the team.
+
+    Works on stacks of teams as well: the leading axes are kept, so all candidate teams
+    can be scored in one call. Returns a dict of arrays, see Team.evaluate.
+    """
+    def_table = def_tables.max(axis=-2)
+    weak = (def_tables > 1).sum(axis=-2)
+    resist = (def_tables < 1).sum(axis=-2)
+    off_table = off_tables.max(axis=-2)
+    return {"def_table": def_table, "weak": weak, "resist": resist,
+            "def_score": (def_table - 1).sum(axis=-1),
+            "stacked": np.maximum(weak - resist, 0).sum(axis=-1),
+            "off_table": off_table,
+            "off_score": off_table.sum(axis=-1)}
+
+def team_score(metrics, weights=None):
+    """Returns the objective of team_metrics, higher is better."""
+    weights = {**default_weights, **(weights or {})}
+    return (weights["off"]*metrics["off_score"] - weights["def"]*metrics["def_score"]
+            - weights["stacked"]*metrics["stacked"])
+
+
+class Team:
+    def __init__(self, members, generation=6):
+        self.gen = normalize_gen(generation)
+        self.members = list(members)
+        if len(self.members) > team_size:
+            raise NotImplementedError(f"A team has at most {team_size} members.")
+
+    @classmethod
+    def from_typings(cls, typings, generation=6, STAB=True):
+        """Builds a team of Pokemon attacking with moves of their own types."""
+        members = []
+        for typing in typings:
+            member = Pokemon(None, typing, generation)
+            member.set_moves_by_type(member.typing_str, STAB)
+            members.append(member)
+        return cls(members, generation)
+
+    def tables(self):
+        """Returns the (members x types) arrays of the multipliers taken and dealt by the members."""
+        n = gen_types[self.gen]
+        def_tables = np.array([member.def_vector[:n] for member in self.members])
+        off_tables = np.array([member.off_vector[:n] for member in self.members])
+        return def_tables.reshape(-1, n), off_tables.reshape(-1, n)
+
+    def evaluate(self, weights=None):
+        """Returns the metrics of the team.
+
+        "def_table" is the worst multiplier any member takes from every attacking type,
+        "weak" and "resist" count the members taking more or less than neutral damage,
+        "stacked" sums max(weak - resist, 0) over the attacking types, "off_table" is the
+        best multiplier the members deal to every type and "score" is team_score.
+        """
+        metrics = team_metrics(*self.tables())
+        metrics["score"] = team_score(metrics, weights)
+        return metrics
+
+    def objective(self, weights=None, STAB=True, candidates=None):
+        """Returns (score, candidates) to search completions of the team with Optimizers.
+
+        score(states) takes an int array (batch x added members) of indices into candidates
+        (all typings of the generation by default) and returns team_score of the team
+        completed with them, for the whole batch at once.
+        """
+        every_typing, def_tables, off_tables = candidate_tables(self.gen, STAB)
+        if candidates is not None:
+            rows = [every_typing.index(tuple(typing)) for typing in candidates]
+            every_typing, def_tables, off_tables = [every_typing[k] for k in rows], def_tables[rows], off_tables[rows]
+        member_def, member_off = self.tables()
+
+        def score(states):
+            states = np.asarray(states).reshape(len(states), -1)
+            shape = (len(states),) + member_def.shape
+            stack_def = np.concatenate([np.broadcast_to(member_def, shape), def_tables[states]], axis=1)
+            stack_off = np.concatenate([np.broadcast_to(member_off, shape), off_tables[states]], axis=1)
+            return team_score(team_metrics(stack_def, stack_off), weights)
+
+        return score, every_typing
+
+    def complete(self, slots=None, candidates=None, top_k=10, weights=None, STAB=True):
+        """Searches the best typings to fill the open slots of the team.
+
+        Every multiset of 'slots' candidate typings (all typings of the generation by default)
+        is scored with team_score; the last slot is vectorized over all candidates. Returns
+        the top_k as (list of typings, score), best first, or with top_k=None all the
+        completions tied for the best score. At most complete_slots slots can be searched,
+        the multisets of more are far too many: use optimize for those.
+        """
+        slots = team_size - len(self.members) if slots is None else slots
+        if slots < 1:
+            return [([], number(self.evaluate(weights)["score"]))]
+        if slots > complete_slots:
+            raise NotImplementedError(f"complete searches at most {complete_slots} open slots, "
+                                      f"not {slots}; use optimize() instead.")
+        score, every_typing = self.objective(weights, STAB, candidates)
+
+        ranking = Ranking(top_k)
+        for chosen in combinations_with_replacement(range(len(every_typing)), slots - 1):
+            start = chosen[-1] if chosen else 0
+            """Appending every remaining candidate as the last member of a stack of teams."""
+            scores = score([chosen + (k,) for k in range(start, len(every_typing))])
+
+            order = np.argsort(-scores, kind="stable")[:top_k]
+            for k in order[scores[order] >= ranking.threshold()]:
+                ranking.record(float(scores[k]), chosen + (start + int(k),))
+
+        best, best_score, result = ranking.result()
+        if not top_k:
+            result = [(best_score, combination) for combination in best]
+        return [([every_typing[k] for k in combination], number(score)) for score, combination in result]
+
+    def optimize(self, method="beam", slots=None, seconds=None, evaluations=None, top_k=5,
+                 weights=None, STAB=True, candidates=None, seed=None, **options):
+        """Searches completions of the team heuristically with one of Optimizers.optimizers.
+
+        The search stops after 'seconds' or 'evaluations' scored teams; options are passed
+        on to the optimizer (e.g. beam_width, restarts, temperature). Returns the optimizer's
+        result with the states of "best" turned into lists of typings.
+        """
+        slots = team_size - len(self.members) if slots is None else slots
+        score, every_typing = self.objective(weights, STAB, candidates)
+        budget = Budget(seconds, evaluations) if seconds or evaluations else None
+        result = optimizers[method](score, len(every_typing), slots, budget=budget, top_k=top_k,
+                                    rng=np.random.default_rng(seed), **options)
+        result["best"] = [([every_typing[k] for k in state], number(value)) for state, value in result["best"]]
+        return result
+
+
+class TeamTest(TestCase):
+    def test_Water_Fire_stacked(self):
+        team = Team.from_typings([["Water"], ["Fire"]])
+        metrics = team.evaluate()
+        expected = [1, 1]
+        actual = [metrics["weak"][types.index("Grass")], metrics["resist"][types.index("Grass")]]
+        self.assertEqual(actual, expected)
+
+    def test_complete_one_slot_gen2(self):
+        fixed = [["Water", "Ground"], ["Steel"], ["Fire", "Flying"], ["Grass"], ["Dark"]]
+        team = Team.from_typings(fixed, 2)
+        scores = {typing: Team.from_typings(fixed + [typing], 2).evaluate()["score"] for typing in typings(2)}
+        expected = max(scores.values())
+        actual = team.complete(top_k=3)[0][1]
+        self.assertEqual(actual, expected)
+
+    def test_complete_all_ties_gen1(self):
+        team = Team.from_typings([["Water"], ["Rock", "Ground"], ["Psychic"], ["Ghost"]], 1)
+        result = team.complete(slots=1, top_k=len(typings(1)))
+        expected = [entry for entry in result if entry[1] == result[0][1]]
+        actual = team.complete(slots=1, top_k=None)
+        self.assertEqual(actual, expected)
+        self.assertEqual(len(actual), 2)
+
+    def test_complete_slot_limit(self):
+        team = Team.from_typings([["Water"]], 1)
+        with self.assertRaises(NotImplementedError):
+            team.complete()
+        with self.assertRaises(NotImplementedError):
+            team.complete(slots=complete_slots + 1)
+        self.assertEqual(len(team.complete(slots=complete_slots, top_k=1)), 1)
+
+    def test_optimize_beam_gen1(self):
+        team = Team.from_typings([["Water"], ["Rock", "Ground"], ["Psychic"], ["Ghost"]], 1)
+        expected = team.complete(slots=2, top_k=1)[0][1]
+        actual = team.optimize("beam", slots=2, beam_width=len(typings(1)))["best"][0][1]
+        self.assertEqual(actual, expected)
+
+    def test_complete_two_slots_order(self):
+        team = Team.from_typings([["Normal"]], 1)
+        result = team.complete(slots=2, top_k=5)
+        expected = sorted([score for _, score in result], reverse=True)
+        actual = [score for _, score in result]
+        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from itertools import combinations
+from types import MappingProxyType
 from unittest import TestCase, main
 
 import Matcher
@@ -7,80 +9,144 @@ types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electri
 gen_types = {1: 15, 2: 17, 6: 18}
 
 
-class Type:
-    def __init__(self, name, generation=6):
-        self.gen = generation
-        if self.gen%1!=0 or self.gen < 1:
-            raise NotImplementedError(f"Generation '{generation}' not recognized.")
-        while self.gen not in [1, 2, 6] and self.gen > 0:
-            self.gen = self.gen - 1
+def normalize_gen(generation):
+    """Returns the generation whose type chart is used for 'generation', i.e. 1, 2 or 6."""
+    gen = generation
+    if gen%1!=0 or gen < 1:
+        raise NotImplementedError(f"Generation '{generation}' not recognized.")
+    while gen not in [1, 2, 6] and gen > 0:
+        gen = gen - 1
+    return int(gen)
+
+
+def typings(generation=6):
+    """Returns all single and dual typings of a generation as tuples.
+
+    The single types come first in the order of types, followed by the dual typings in the
+    order of itertools.combinations, which is the row order of Pokemon.batch_def_profiles.
+    """
+    n = gen_types[normalize_gen(generation)]
+    return [(element,) for element in types[:n]] + list(combinations(types[:n], 2))
+
+def typing_row(typing, generation=6):
+    """Returns the position of a typing in typings(generation), ignoring order, duplicates and None."""
+    n = gen_types[normalize_gen(generation)]
+    typing = set(typing) - {None, "None"}
+    if not typing <= set(types[:n]) or len(typing) not in [1, 2]:
+        raise NotImplementedError(f"Typing {sorted(typing)} not recognized in generation {generation}.")
+
+    indices = sorted(Matcher.type_index[element] for element in typing)
+    if len(indices) == 1:
+        return indices[0]
+    i, j = indices
+    return n + i*n - i*(i+1)//2 + j - i - 1
+
 
+class Type:
+    """Types are flyweights: Type(name, generation) builds the tables once per type chart and
+    afterwards returns the same frozen instance; its tables are read-only mappings and its
+    lists of types are tuples."""
+    __slots__ = ("gen", "type", "def_vector", "off_vector", "def_table", "off_table",
+                 "weaknesses", "resistances", "immunities", "def_neutral", "def_score",
+                 "advantages", "disadvantages", "unsusceptibles", "off_neutral", "off_score",
+                 "_key", "_hash")
+    _registry = {}
+
+    def __new__(cls, name, generation=6):
+        gen = normalize_gen(generation)
+        try:
+            return cls._registry[name, gen]
+        except KeyError:
+            pass
+
+        if name not in types:
+            raise NotImplementedError(f"Type '{name}' not recognized")
+        self = super().__new__(cls)
+        self._build(name, gen)
+        cls._registry[name, gen] = self
+        return self
+
+    @classmethod
+    def get(cls, name, generation=6):
+        """Same as Type(name, generation), returning the interned instance."""
+        return cls(name, generation)
+
+    def _build(self, name, gen):
+        self.gen = gen
         self.type = name
-        if self.type not in types:
-            raise NotImplementedError(f"Type '{self.type}' not recognized")
-
-        self.weaknesses = []
-        self.resistances = []
-        self.immunities = []
-        self.def_neutral = types[:gen_types[self.gen]]
-        self.def_table = {}
+
+        n = gen_types[self.gen]
+        matrix = Matcher.effectiveness(self.gen)
+        index = Matcher.type_index[self.type]
+
+        """Multipliers taken and dealt by this type, aligned with types[:gen_types[self.gen]]."""
+        self.def_vector = matrix[:n, index]
+        self.off_vector = matrix[index, :n]
+        self.def_table = MappingProxyType(dict(zip(types[:n], self.def_vector.tolist())))
+        self.off_table = MappingProxyType(dict(zip(types[:n], self.off_vector.tolist())))
+
+        self.weaknesses = ()
+        self.resistances = ()
+        self.immunities = ()
+        self.def_neutral = tuple(types[:n])
         self.def_score = 0
 
-        self.advantages = []
-        self.disadvantages = []
-        self.unsusceptibles = []
-        self.off_neutral = types[:gen_types[self.gen]]
-        self.off_table = {}
+        self.advantages = ()
+        self.disadvantages = ()
+        self.unsusceptibles = ()
+        self.off_neutral = tuple(types[:n])
         self.off_score = 0
 
         """Making some exceptions for Steel, Dark and Fairy"""
-        if self.type not in types[:gen_types[self.gen]]:
-            self.def_neutral = types[:gen_types[self.gen]]
-            self.def_table = {element: 1 for element in types[:gen_types[self.gen]]}
-            self.unsusceptibles = types[:gen_types[self.gen]]
-            self.off_neutral = []
-            self.off_table = {element: 0 for element in types[:gen_types[self.gen]]}
+        if self.type not in types[:n]:
+            self.unsusceptibles = tuple(types[:n])
+            self.off_neutral = ()
+            self._freeze()
             return
 
 
         """Defensive properties."""
-        self.resistances, self.weaknesses, self.immunities = Matcher.def_matchups[self.gen].loc[self.type]
+        """Copied into tuples, the lists of Matcher.def_matchups are shared by the whole process."""
+        self.resistances, self.weaknesses, self.immunities = map(tuple, Matcher.def_matchups[self.gen][self.type])
+        self.def_neutral = tuple(element for element in types[:n] if self.def_table[element] == 1)
 
-        self.def_neutral = list(set(self.def_neutral) - set(self.weaknesses)
-                            - set(self.resistances) - set(self.immunities))
-
-        self.def_table = {weak: 2 for weak in self.weaknesses}
-        self.def_table.update({resist: 0.5 for resist in self.resistances})
-        self.def_table.update({immu: 0 for immu in self.immunities})
-        self.def_table.update({neutral: 1 for neutral in self.def_neutral})
-
-        self.def_score = sum([self.def_table[k] for k in types[:gen_types[self.gen]]])
+        self.def_score = float(self.def_vector.sum())
         if self.def_score%1 == 0:
             self.def_score = int(self.def_score)
 
 
         """Offensive properties."""
-        self.advantages, self.disadvantages, self.unsusceptibles = Matcher.off_matchups[self.gen].loc[self.type]
-
-        self.off_neutral = list(set(self.off_neutral) - set(self.advantages) 
-                                - set(self.disadvantages) - set(self.unsusceptibles))
+        self.advantages, self.disadvantages, self.unsusceptibles = map(tuple, Matcher.off_matchups[self.gen][self.type])
+        self.off_neutral = tuple(element for element in types[:n] if self.off_table[element] == 1)
 
-        self.off_table = {adv: 2 for adv in self.advantages}
-        self.off_table.update({dis: 0.5 for dis in self.disadvantages})
-        self.off_table.update({unsus: 0  for unsus in self.unsusceptibles})
-        self.off_table.update({neutral: 1 for neutral in self.off_neutral})
-
-        self.off_score = sum([self.off_table[k] for k in types[:gen_types[self.gen]]])
+        self.off_score = float(self.off_vector.sum())
         if self.off_score%1 == 0:
             self.off_score = int(self.off_score)
+        self._freeze()
+
+    def _freeze(self):
+        """Equality used to compare str(self), which only depends on these attributes."""
+        self._key = (self.type, self.weaknesses, self.resistances, self.immunities)
+        self._hash = hash(self._key)
+
+    def __setattr__(self, attr, value):
+        if hasattr(self, "_hash"):
+            raise AttributeError(f"Type '{self.type}' is immutable.")
+        object.__setattr__(self, attr, value)
+
+    def __delattr__(self, attr):
+        raise AttributeError(f"Type '{self.type}' is immutable.")
+
+    def __reduce__(self):
+        return Type, (self.type, self.gen)
 
     def __str__(self):
         res =  f"Type: {self.type}\nWeaknesses: " + ", ".join(self.weaknesses)
-        if self.resistances == []: 
+        if not self.resistances:
             "\nNo Resistances"
         else:
             res += "\nResistances: " + ", ".join(self.resistances)
-        if self.immunities != []:
+        if self.immunities:
             res += "\nImmunities: " + ", ".join(self.immunities)
         return res
 
@@ -88,12 +154,14 @@ class Type:
         return str(self.type)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, Type):
-            return  str(self) == str(other)
+            return self._hash == other._hash and self._key == other._key
         return False
 
     def __hash__(self):
-        return len(self.immunities)+len(self.weaknesses)*10+len(self.resistances)*100
+        return self._hash
 
     def direct(self, other):
         if self.def_table[other.type] < other.def_table[self.type]:
@@ -151,25 +219,58 @@ class TypeTest(TestCase):
         actual = Type("Grass") == Type("Bug")
         self.assertEqual(actual, expected)
 
+    def test_Ice_gen3_is_Ice_gen2(self):
+        expected = Type("Ice", 2)
+        actual = Type.get("Ice", 3)
+        self.assertIs(actual, expected)
+
+    def test_Water_immutable(self):
+        with self.assertRaises(AttributeError):
+            Type("Water").def_score = 0
+
+    def test_Fire_lists_immutable(self):
+        with self.assertRaises(AttributeError):
+            Type("Fire", 6).weaknesses.append("Fire")
+        with self.assertRaises(TypeError):
+            Type("Fire", 6).advantages[0] = "Fire"
+        expected = ["Ground", "Rock", "Water"]
+        actual = Matcher.def_matchups[6]["Fire"][1]
+        self.assertEqual(actual, expected)
+
+    def test_Normal_hash_gen1_gen6(self):
+        expected = hash(Type("Normal", 6))
+        actual = hash(Type("Normal", 1))
+        self.assertEqual(actual, expected)
+
     def test_Steel_def_neutral_gen1(self):
-        expected = types[:gen_types[1]]
+        expected = tuple(types[:gen_types[1]])
         actual = Type("Steel", 1).def_neutral
         self.assertEqual(actual, expected)
 
     def test_Fairy_def_neutral_gen2(self):
-        expected = types[:gen_types[2]]
+        expected = tuple(types[:gen_types[2]])
         actual = Type("Fairy", 2).def_neutral
         self.assertEqual(actual, expected)
 
+    def test_Water_Fire_effectiveness(self):
+        expected = 2
+        actual = Matcher.effectiveness(6)[Matcher.type_index["Water"], Matcher.type_index["Fire"]]
+        self.assertEqual(actual, expected)
+
+    def test_Dark_off_vector_gen1(self):
+        expected = [0]*gen_types[1]
+        actual = Type("Dark", 1).off_vector.tolist()
+        self.assertEqual(actual, expected)
+
 
     """2.  Generation Insensitive Test Cases"""
     def test_Normal_super_effective(self):
-        expected = []
+        expected = ()
         actual = Type("Normal").advantages
         self.assertEqual(actual, expected)
 
     def test_Normal_weaknesses(self):
-        expected = ["Fighting"]
+        expected = ("Fighting",)
         actual = Type("Normal").weaknesses
         self.assertEqual(actual, expected)
 
@@ -179,7 +280,7 @@ class TypeTest(TestCase):
         self.assertEqual(actual, expected)
 
     def test_Ghost_resistances(self):
-        expected = ["Bug", "Poison"]
+        expected = ("Bug", "Poison")
         actual = Type("Ghost").resistances
         self.assertEqual(actual, expected)
 
@@ -198,59 +299,59 @@ class TypeTest(TestCase):
         self.assertEqual(actual, expected)
 
     def test_Psychic_immunities_gen1(self):
-        expected = ["Ghost"]
+        expected = ("Ghost",)
         actual = Type("Psychic", 1).immunities
         self.assertEqual(actual, expected)
 
     def test_Poison_advantages_gne1(self):
-        expected = ["Bug", "Grass"]
+        expected = ("Bug", "Grass")
         actual = Type("Poison", 1).advantages
         self.assertEqual(actual, expected)
 
     def test_Bug_advantages_gen1(self):
-        expected = ["Grass", "Poison", "Psychic"]
+        expected = ("Grass", "Poison", "Psychic")
         actual = Type("Bug", 1).advantages
         self.assertEqual(actual, expected)
 
     def test_Fire_resistances_gne1(self):
-        expected = ["Bug", "Fire", "Grass"]
+        expected = ("Bug", "Fire", "Grass")
         actual = Type("Fire", 1).resistances
         self.assertEqual(actual, expected)
 
     def test_Water_resistances_gne1(self):
-        expected = ["Fire", "Ice", "Water"]
+        expected = ("Fire", "Ice", "Water")
         actual = Type("Water", 1).resistances
         self.assertEqual(actual, expected)
 
     def test_Fighting_advantages_gen1(self):
-        expected = ["Ice", "Normal", "Rock"]
+        expected = ("Ice", "Normal", "Rock")
         actual = Type("Fighting", 1).advantages
         self.assertEqual(actual, expected)
 
     """3.2 Generation 2 Test Cases"""
     def test_Psychic_imunities_gen2(self):
-        expected = []
+        expected = ()
         actual = Type("Psychic", 2).immunities
         self.assertEqual(actual, expected)
 
     def test_Steel_advantages_gen2(self):
-        expected = ["Ice", "Rock"]
+        expected = ("Ice", "Rock")
         actual = Type("Steel", 2).advantages
         self.assertEqual(actual, expected)
 
     def test_Fire_resistances_gen2(self):
-        expected = ["Bug", "Fire", "Grass", "Ice", "Steel"]
+        expected = ("Bug", "Fire", "Grass", "Ice", "Steel")
         actual = Type("Fire", 2).resistances
         self.assertEqual(actual, expected)
 
     """3.3 Generation 6 Test Cases"""
     def test_Fire_resistances_gen6(self):
-        expected = ["Bug", "Fire", "Fairy", "Grass", "Ice", "Steel"]
+        expected = ("Bug", "Fire", "Fairy", "Grass", "Ice", "Steel")
         actual = Type("Fire").resistances
         self.assertEqual(actual, expected)
 
     def test_Fairy_immunities_gen6(self):
-        expected = ["Dragon"]
+        expected = ("Dragon",)
         actual = Type("Fairy").immunities
         self.assertEqual(actual, expected)
 
@@ -265,7 +366,7 @@ class TypeTest(TestCase):
         self.assertEqual(actual, expected)
 
     def test_Poison_resistances_gen6(self):
-        expected = ["Bug", "Fairy", "Fighting", "Grass", "Poison"]
+        expected = ("Bug", "Fairy", "Fighting", "Grass", "Poison")
         actual = Type("Poison").resistances
         self.assertEqual(actual, expected)
 
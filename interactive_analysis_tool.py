@@ -1,10 +1,9 @@
 import numpy as np
-from bokeh.models import ColumnDataSource, Div, Select, Button, CheckboxGroup
+from bokeh.models import ColumnDataSource, Div, Select, Button, CheckboxGroup, FixedTicker
 from bokeh.plotting import figure, curdoc
 from bokeh.layouts import column, row
 
 from Pokemon import Pokemon
-from Types import Type
 
 types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
          "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
@@ -27,40 +26,59 @@ matchups_plot.xaxis.major_label_orientation = np.pi/4
 offensive_plot = figure(title="Offensive Line-Up", plot_height=375, plot_width=250,
                          x_range=[-0.25, 3.25], y_range=rev_types, toolbar_location=None, tools="")
 
+"""The plots share one ColumnDataSource and their glyphs are added once, transform only
+sends the rows which changed to the browser."""
+source = ColumnDataSource(dict(Types     = types,
+                               Defensive = [-1 for element in types],
+                               Matchup   = ["No Data" for element in types],
+                               Offensive = [-1 for element in types],
+                               colours   = ["black" for element in types]), name="source")
+
+def_circles = defensive_plot.circle(x="Defensive", y="Types", size=10, source=source, color="purple")
+off_circles = offensive_plot.circle(x="Offensive", y="Types", size=10, source=source, color="purple")
+mat_circles = matchups_plot.circle(x="Matchup", y="Types", size=10, source=source, color="colours")
+
+def_ticker = FixedTicker(ticks=[])
+off_ticker = FixedTicker(ticks=[])
+defensive_plot.xaxis.ticker = def_ticker
+offensive_plot.xaxis.ticker = off_ticker
+
 
 def transform():
     """Updates the ColumnDataSource and the plots according to the values of the various selects."""
-    for circle in utility["circles"]:
-        circle.visible = False
-
     defensive_line_up, offensive_line_up, dot_size = get_line_up()
 
     matchups_line_up, colour = get_matchup_table(defensive_line_up, offensive_line_up)
 
-    source = ColumnDataSource(dict(Types = types, 
-                               Defensive = defensive_line_up,
-                               Matchup   = matchups_line_up,
-                               Offensive = offensive_line_up,
-                               colours   = colour))
-
-    def_circles = defensive_plot.circle(x="Defensive", y="Types", size=dot_size, source=source, color="purple")
-    off_circles = offensive_plot.circle(x="Offensive", y="Types", size=10, source=source, color="purple")
-    mat_circles = matchups_plot.circle(x="Matchup", y="Types", size=10, source=source, color="colours")
-    utility["circles"] = [def_circles, mat_circles, off_circles]
+    update_source(dict(Defensive = defensive_line_up,
+                       Matchup   = matchups_line_up,
+                       Offensive = offensive_line_up,
+                       colours   = colour))
+    def_circles.glyph.size = dot_size
 
     update_ticker(defensive_line_up, offensive_line_up)
 
-    def_score_DIV.text = f"defensive score: {monster.def_score}"
-    off_score_DIV.text = f"offensive score: {monster.off_score}"
+    def_score_DIV.text = f"defensive score: {utility['monster'].def_score}"
+    off_score_DIV.text = f"offensive score: {utility['monster'].off_score}"
+
+def update_source(data):
+    """Patches the rows of the columns of source whose values differ from data."""
+    patches = {}
+    for key, values in data.items():
+        changed = [(k, value) for k, (old, value) in enumerate(zip(source.data[key], values)) if old != value]
+        if changed:
+            patches[key] = changed
+    if patches:
+        source.patch(patches)
 
 def get_line_up():
     """Gets the defensive and offensive line_up and prepares it for the ColumnDataSource."""
     utility["monster"].get_def_matchups(utility["gen"])
     utility["monster"].set_moves_by_type(utility["attacks"], utility["STAB"], utility["gen"])
 
-    defensive = [utility["monster"].def_table[element] for element in types[:gen_types[utility["gen"]]]] 
+    defensive = utility["monster"].def_vector[:gen_types[utility["gen"]]].tolist()
     defensive += [-1 for element in types[gen_types[utility["gen"]]:]]
-    offensive = [utility["monster"].off_table[element] for element in types[:gen_types[utility["gen"]]]]
+    offensive = utility["monster"].off_vector[:gen_types[utility["gen"]]].tolist()
     offensive += [-1 for element in types[gen_types[utility["gen"]]:]]
 
     maximum = max(defensive)
@@ -79,7 +97,7 @@ def get_matchup_table(defense, offense):
 
     if utility["STAB"] == True:
         utility["monster"].set_moves_by_type(utility["attacks"], False, utility["gen"])
-        offense = [utility["monster"].off_table[element] for element in types[:gen_types[utility["gen"]]]]
+        offense = utility["monster"].off_vector[:gen_types[utility["gen"]]].tolist()
         offense += [-1 for element in types[gen_types[utility["gen"]]:]]
 
     for k in range(gen_types[utility["gen"]]):
@@ -106,12 +124,16 @@ def get_matchup_table(defense, offense):
     return matchups, colour
 
 def update_ticker(defense, offense):
+    """Updates the ticks of the tickers in place, only if they changed."""
     maximum = max(defense)
     if maximum <= 8:
-        defensive_plot.xaxis.ticker = list(set([val for val in defense if (val-0.5)%1==0 or val%1==0]))
+        def_ticks = sorted(set([val for val in defense if (val-0.5)%1==0 or val%1==0]))
     else:
-        defensive_plot.xaxis.ticker = list(set([val for val in defense if val%1==0]))
-    offensive_plot.xaxis.ticker = list(set([val for val in offense if (val-0.5)%1==0 or val%1==0]))
+        def_ticks = sorted(set([val for val in defense if val%1==0]))
+    off_ticks = sorted(set([val for val in offense if (val-0.5)%1==0 or val%1==0]))
+    for ticker, ticks in [(def_ticker, def_ticks), (off_ticker, off_ticks)]:
+        if list(ticker.ticks) != ticks:
+            ticker.ticks = ticks
     
 def time_travel(attr, old, new):
     """Changes the generation to match the value of gen_select"""
@@ -129,8 +151,7 @@ def time_travel(attr, old, new):
 def reflect_type(clicked):
     """Updates the typing according to the selected boxes from "typing_select"."""
     utility["typing"] = [types[index] for index in clicked]
-    utility["monster"].typing = [Type(element, utility["gen"]) for element in utility["typing"]]
-    utility["monster"].typing_str = utility["typing"]
+    utility["monster"].set_typing(utility["typing"])
     transform()
 
 def multitype(clicked):
@@ -153,19 +174,20 @@ def stabify():
 
 
 """Adding a Select to change the generation"""
-gen_select = Select(title="Select a generation", value="6 - 9", options=["1", "2 - 5", "6 - 9"], width=150)
+gen_select = Select(title="Select a generation", value="6 - 9", options=["1", "2 - 5", "6 - 9"], width=150,
+                    name="gen_select")
 gen_select.on_change("value", time_travel)
 
 """Adding a CheckboxGroup to select the typing"""
-typing_select = CheckboxGroup(labels=types, active=[], width=150, height=312)
+typing_select = CheckboxGroup(labels=types, active=[], width=150, height=312, name="typing_select")
 typing_select.on_click(reflect_type)
 
 """Adding a CheckboxGroup to select the types of the attacks"""
-attack_select = CheckboxGroup(labels=types, active=[], width=150, height=312)
+attack_select = CheckboxGroup(labels=types, active=[], width=150, height=312, name="attack_select")
 attack_select.on_click(multitype)
 
 """Adding a Toggle to activate/deactivate STAB"""
-stab_button = Button(label="activate STAB")
+stab_button = Button(label="activate STAB", name="stab_button")
 stab_button.on_click(stabify)
 
 
@@ -188,7 +210,7 @@ layout = column(row(gen_select, column(height_DIV, stab_button)),
 
 """Setting the default values."""
 monster = Pokemon(None, [], 6)
-utility = {"monster": monster, "attacks": [], "typing": [], "gen": 6, "circles": [], "STAB": False}
+utility = {"monster": monster, "attacks": [], "typing": [], "gen": 6, "STAB": False}
 
 transform()
 
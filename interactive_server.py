@@ -0,0 +1,149 @@
+import argparse
+import random
+import time
+import tracemalloc
+from os import path
+
+import numpy as np
+from bokeh.application import Application
+from bokeh.application.handlers import ScriptHandler
+from bokeh.document import Document
+from bokeh.events import ButtonClick
+from bokeh.server.server import Server
+
+import Matcher
+from DefensiveTables import response_tables
+from Pokemon import Pokemon
+
+types = ["Grass", "Fire", "Water", "Bug", "Poison", "Normal", "Flying", "Electric", "Ground",
+         "Fighting", "Psychic", "Rock", "Ice", "Ghost", "Dragon", "Steel", "Dark", "Fairy"]
+gen_types = {1: 15, 2: 17, 6: 18}
+gen_values = {"1": 1, "2 - 5": 2, "6 - 9": 6}
+
+app_dir = path.dirname(path.abspath(__file__))
+apps = {"/analysis": "interactive_analysis_tool.py", "/defensive": "interactive_def_plots.py"}
+
+"""
+Bokeh runs the script of an app once per session, in a fresh module, so everything the
+scripts keep in their globals (utility, gen, regression, ...) belongs to one session.
+What the scripts import is shared by all the sessions of a process instead, which is
+where the immutable data lives: the matchups of Matcher, the Type flyweights, the results
+memoized by Pokemon and the response tables of DefensiveTables. preload() fills them
+before the server starts, so with num_procs > 1 the forked processes share them too.
+"""
+
+
+def preload():
+    """Loads the data shared by all sessions: the matchups of every generation and the response tables."""
+    Matcher.preload()
+    response_tables()
+    for gen in Matcher.generations:
+        Pokemon(None, [], gen)
+
+def applications():
+    """Returns {route: Application} of the Bokeh apps."""
+    return {route: Application(ScriptHandler(filename=path.join(app_dir, script))) for route, script in apps.items()}
+
+def serve(port=5006, num_procs=1, allow_websocket_origin=None):
+    """Serves both apps from one Bokeh server, e.g. http://localhost:5006/analysis."""
+    preload()
+    server = Server(applications(), port=port, num_procs=num_procs,
+                    allow_websocket_origin=allow_websocket_origin or [f"localhost:{port}"])
+    server.start()
+    print(f"Serving {', '.join(apps)} on port {port}.")
+    server.io_loop.start()
+
+
+def new_session(application):
+    """Simulates the opening of a session: the app script runs on a new Document."""
+    doc = Document()
+    application.initialize_document(doc)
+    return doc
+
+def click(doc, name):
+    button = doc.select_one({"name": name})
+    button._trigger_event(ButtonClick(button))
+
+def interact(route, doc, rng):
+    """Performs a random interaction on a session of an app, returns the generation it should show."""
+    gen_select = doc.select_one({"name": "gen_select"})
+    action = rng.randrange(4)
+    if action == 0:
+        gen_select.value = rng.choice(list(gen_values))
+    elif route == "/analysis":
+        if action == 1:
+            doc.select_one({"name": "typing_select"}).active = rng.sample(range(18), rng.randint(0, 2))
+        elif action == 2:
+            doc.select_one({"name": "attack_select"}).active = rng.sample(range(18), rng.randint(0, 4))
+        else:
+            click(doc, "stab_button")
+    else:
+        if action == 1:
+            doc.select_one({"name": "buttons"}).active = rng.randrange(7)
+        elif action == 2:
+            dual_select = doc.select_one({"name": "dual_select"})
+            dual_select.value = rng.choice(dual_select.options)
+        else:
+            click(doc, rng.choice(["stats_button", "line_button"]))
+    return gen_values[gen_select.value]
+
+def isolated(route, doc, gen):
+    """Checks that the source of a session shows the generation of that session."""
+    data = doc.select_one({"name": "source"}).data
+    if route == "/analysis":
+        return data["Matchup"].count("No Data") == len(types) - gen_types[gen]
+    return len(data["Types"]) == gen_types[gen]
+
+def load_test(sessions=30, interactions=20, seed=0):
+    """Drives 'sessions' simulated sessions of each app, interleaving 'interactions' random interactions each.
+
+    Every interaction is a callback of the app run the way the server runs it. Returns the
+    timings in milliseconds (session creation and interaction p50/p99/max), the memory
+    allocated per session in kB and whether every session kept its own state.
+    """
+    rng = random.Random(seed)
+    preload()
+    served = applications()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    opened, docs = [], []
+    for k in range(sessions):
+        for route, application in served.items():
+            start = time.perf_counter()
+            docs.append((route, new_session(application), 6))
+            opened.append(time.perf_counter() - start)
+    per_session = (tracemalloc.get_traced_memory()[0] - before) / len(docs) / 1024
+    tracemalloc.stop()
+
+    latencies = []
+    for k in range(interactions):
+        for i, (route, doc, gen) in enumerate(docs):
+            start = time.perf_counter()
+            docs[i] = (route, doc, interact(route, doc, rng))
+            latencies.append(time.perf_counter() - start)
+
+    opened, latencies = np.array(opened) * 1000, np.array(latencies) * 1000
+    return {"sessions": len(docs), "interactions": len(latencies),
+            "open ms p50": float(np.percentile(opened, 50)), "open ms max": float(opened.max()),
+            "interaction ms p50": float(np.percentile(latencies, 50)),
+            "interaction ms p99": float(np.percentile(latencies, 99)),
+            "interaction ms max": float(latencies.max()),
+            "kB per session": per_session,
+            "isolated": all(isolated(route, doc, gen) for route, doc, gen in docs)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the Bokeh apps with shared data, or load tests them.")
+    parser.add_argument("--port", type=int, default=5006)
+    parser.add_argument("--procs", type=int, default=1, help="number of server processes, 0 for one per CPU")
+    parser.add_argument("--origin", action="append", help="allowed websocket origin, e.g. myhost:5006")
+    parser.add_argument("--load-test", type=int, metavar="SESSIONS", help="simulate SESSIONS sessions per app instead")
+    parser.add_argument("--interactions", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.load_test:
+        for key, value in load_test(args.load_test, args.interactions).items():
+            print(f"{key}: {value}")
+    else:
+        serve(args.port, args.procs, args.origin)